@@ -0,0 +1,51 @@
+"""
+Verified-token cache for get_current_user.
+A token is checked against the users table once, then maps straight to an
+identity without a lookup. Entries live until the TTL or the token's own
+expiry, whichever comes first, so the TTL also bounds how long a deleted or
+renamed user's token keeps working.
+"""
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+ADMIN_USERNAME = "admin"
+
+class AuthenticatedUser(NamedTuple):
+    id: int
+    username: str
+    role: str
+
+def role_for(username: str) -> str:
+    return "admin" if username == ADMIN_USERNAME else "counter"
+
+class TokenCache:
+    """Bounded LRU of token -> AuthenticatedUser with per-entry expiry"""
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def get(self, token: str) -> Optional[AuthenticatedUser]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        user, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return user
+
+    def put(self, token: str, user: AuthenticatedUser, token_expires_at: Optional[float] = None):
+        expires_at = time.monotonic() + self.ttl
+        if token_expires_at is not None:
+            expires_at = min(expires_at, time.monotonic() + (token_expires_at - time.time()))
+        self._entries[token] = (user, expires_at)
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
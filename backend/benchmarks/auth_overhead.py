@@ -0,0 +1,58 @@
+"""
+Per-request cost of get_current_user.
+Compares a legacy token (sub only) and a token with embedded claims on a
+cache miss, where each is checked against the users table, with a token
+cache hit.
+
+    python benchmarks/auth_overhead.py --iterations 2000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "auth_overhead.db"))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("HRMS_API_URL", "http://127.0.0.1:9/")
+os.environ.setdefault("HRMS_API_TOKEN", "benchmark")
+
+from database import AsyncSessionLocal
+from bootstrap import bootstrap
+from models import User
+import server
+
+async def time_auth(token: str, iterations: int, use_cache: bool) -> float:
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            if not use_cache:
+                server.token_cache.clear()
+            await server.get_current_user(token, db)
+        return (time.perf_counter() - started) / iterations * 1e6
+
+async def main(args):
+    bootstrap()
+    await server.startup_event()
+
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, 1)
+    legacy_token = server.create_access_token({"sub": user.username})
+    claims_token = server.create_access_token(server.token_claims(user))
+
+    print(f"{'path':<28} {'us/request':>10}")
+    for label, token, use_cache in (
+        ("legacy token, DB lookup", legacy_token, False),
+        ("claims token, cache miss", claims_token, False),
+        ("claims token, cache hit", claims_token, True),
+    ):
+        await time_auth(token, 50, use_cache)  # warm-up
+        print(f"{label:<28} {await time_auth(token, args.iterations, use_cache):>10.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=2000)
+    asyncio.run(main(parser.parse_args()))
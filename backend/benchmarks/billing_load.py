@@ -0,0 +1,154 @@
+"""
+Billing throughput under load.
+Drives POST /api/billing/create in-process at several concurrency levels,
+with and without /api/reports/company running alongside, and prints req/s
+and latency percentiles for each run. Afterwards it pages through
+/api/billing/history and checks every bill comes back exactly once (most of
+them share a created_at second, so this exercises the cursor tie-break).
+
+    python benchmarks/billing_load.py --bills 50000 --requests 400
+
+Uses DATABASE_URL when set (point it at a scratch MySQL database for
+realistic numbers), otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "billing_load.db"))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("HRMS_API_URL", "http://127.0.0.1:9/")
+os.environ.setdefault("HRMS_API_TOKEN", "benchmark")
+
+import httpx
+
+from database import SessionLocal
+from bootstrap import bootstrap
+from models import BillingRecord
+from consumption import billing_columns
+import server
+
+COMPANIES = ["Refex Industries Limited", "Refex Green Mobility Limited", "Sparzana", "Refex Holding Private Limited"]
+
+def seed_bills(count: int, batch_size: int = 5000):
+    """Fill billing_records so the company report has real work to do"""
+    db = SessionLocal()
+    try:
+        for start in range(0, count, batch_size):
+            rows = []
+            for i in range(start, min(start + batch_size, count)):
+                customer = {"employeeId": f"SEED{i:07d}", "employeeName": f"Seed {i}", "companyName": COMPANIES[i % len(COMPANIES)]}
+                items = [{"name": "Breakfast" if i % 2 else "Lunch", "quantity": 1}]
+                rows.append({
+                    "date": f"2025-01-{i % 28 + 1:02d}",
+                    "time": "09:00 AM",
+                    "is_guest": False,
+                    "is_support_staff": False,
+                    "customer": customer,
+                    "items": items,
+                    "total_items": 1,
+                    "total_amount": 20.0,
+                    "pricing_type": "employee",
+                    "created_by": "admin",
+                    **billing_columns(False, False, customer, items)
+                })
+            db.bulk_insert_mappings(BillingRecord, rows)
+            db.commit()
+    finally:
+        db.close()
+
+def bill_payload(run: str, n: int) -> dict:
+    # A distinct customer per bill, so the daily limit rows never contend
+    return {
+        "date": "2025-02-01",
+        "time": "12:30 PM",
+        "customer": {"employeeId": f"{run}-{n}", "employeeName": f"Load {n}", "companyName": COMPANIES[n % len(COMPANIES)]},
+        "items": [{"name": "Lunch", "price": 48, "quantity": 1}],
+        "total_items": 1,
+        "total_amount": 48.0
+    }
+
+async def report_load(client: httpx.AsyncClient, stop: asyncio.Event) -> int:
+    runs = 0
+    while not stop.is_set():
+        response = await client.get("/api/reports/company")
+        response.raise_for_status()
+        runs += 1
+    return runs
+
+async def billing_run(client: httpx.AsyncClient, run: str, total: int, concurrency: int) -> dict:
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            started = time.perf_counter()
+            response = await client.post("/api/billing/create", json=bill_payload(run, n))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "rps": total / elapsed,
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000
+    }
+
+async def check_history_paging(client: httpx.AsyncClient, expected: int, page_size: int):
+    seen = []
+    cursor = None
+    while True:
+        params = {"fields": "id", "limit": page_size}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/api/billing/history", params=params)
+        response.raise_for_status()
+        page = response.json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["nextCursor"]
+        if not cursor or len(seen) > expected:
+            break
+    if len(seen) != expected or len(set(seen)) != expected:
+        raise SystemExit(f"history paging returned {len(seen)} rows ({len(set(seen))} distinct), expected {expected}")
+    print(f"history paging: {expected} bills in pages of {page_size}, no gaps or repeats")
+
+async def main(args):
+    bootstrap()
+    if args.bills:
+        seed_bills(args.bills)
+    await server.startup_event()
+
+    token = server.create_access_token({"sub": "admin"})
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Authorization": f"Bearer {token}"}, timeout=None) as client:
+        print(f"{'concurrency':>11} {'reports':>8} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'report runs':>11}")
+        for concurrency in args.concurrency:
+            for with_reports in (False, True):
+                stop = asyncio.Event()
+                reporter = asyncio.create_task(report_load(client, stop)) if with_reports else None
+                result = await billing_run(client, f"c{concurrency}{'r' if with_reports else ''}", args.requests, concurrency)
+                stop.set()
+                report_runs = await reporter if reporter else 0
+                print(f"{concurrency:>11} {'yes' if with_reports else 'no':>8} {result['rps']:>8.1f} "
+                      f"{result['p50']:>8.1f} {result['p95']:>8.1f} {report_runs:>11}")
+
+        created = args.requests * len(args.concurrency) * 2
+        await check_history_paging(client, args.bills + created, args.page_size)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bills", type=int, default=20000, help="billing rows to seed before the run")
+    parser.add_argument("--requests", type=int, default=200, help="bills created per run")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--page-size", type=int, default=500, help="billing history page size for the paging check")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,133 @@
+"""
+Large list response cost.
+Serves 10k-row /api/employees and /api/reports/employee responses through
+the previous per-row Pydantic/jsonable_encoder path and the FastJSONResponse
+path, uncompressed and with gzip/brotli, and prints p50/p99 latency and
+bytes on the wire.
+
+    python benchmarks/list_responses.py --rows 10000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "list_responses.db"))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("HRMS_API_URL", "http://127.0.0.1:9/")
+os.environ.setdefault("HRMS_API_TOKEN", "benchmark")
+
+import httpx
+from fastapi import Depends
+from sqlalchemy import select
+
+from bootstrap import bootstrap
+from consumption import billing_columns
+from database import SessionLocal
+from models import BillingRecord, Employee
+from schemas import EmployeeResponse
+import compression
+import server
+
+COMPANIES = ["Refex Industries Limited", "Refex Green Mobility Limited", "Sparzana", "Refex Holding Private Limited"]
+
+def seed(rows: int):
+    db = SessionLocal()
+    try:
+        db.bulk_insert_mappings(Employee, [
+            {
+                "employee_id": f"RFX{i:06d}",
+                "employee_name": f"Employee Number {i}",
+                "company_name": COMPANIES[i % len(COMPANIES)],
+                "entity": "Refex",
+                "mobile_number": f"98400{i:05d}",
+                "location": "Chennai",
+                "qr_code": f"https://hrms.example.com/qr/RFX{i:06d}.png",
+                "is_active": True,
+                "created_by": "admin",
+                "created_date": "2025-01-01"
+            }
+            for i in range(rows)
+        ])
+        bills = []
+        for i in range(rows):
+            customer = {"employeeId": f"RFX{i:06d}", "employeeName": f"Employee Number {i}", "companyName": COMPANIES[i % len(COMPANIES)]}
+            items = [{"name": "Breakfast" if i % 2 else "Lunch", "quantity": 1}]
+            bills.append({
+                "date": f"2025-01-{i % 28 + 1:02d}",
+                "time": "09:00 AM",
+                "is_guest": False,
+                "is_support_staff": False,
+                "customer": customer,
+                "items": items,
+                "total_items": 1,
+                "total_amount": 20.0,
+                "pricing_type": "employee",
+                "created_by": "admin",
+                **billing_columns(False, False, customer, items)
+            })
+        db.bulk_insert_mappings(BillingRecord, bills)
+        db.commit()
+    finally:
+        db.close()
+
+# The pre-fast-path handlers, for comparison
+@server.app.get("/bench/legacy/employees", response_model=List[EmployeeResponse])
+async def legacy_employees(db=Depends(server.get_db), current_user=Depends(server.get_current_user)):
+    result = await db.execute(select(Employee))
+    return [EmployeeResponse.from_orm(emp) for emp in result.scalars().all()]
+
+@server.app.get("/bench/legacy/reports/employee")
+async def legacy_employee_report(db=Depends(server.get_db), current_user=Depends(server.get_current_user)):
+    query = server.employee_report_query(current_user.username, None, None, None, None)
+    return [server.employee_report_row(bill) for bill in await db.execute(query)]
+
+async def measure(client: httpx.AsyncClient, url: str, encoding: str, requests: int) -> dict:
+    latencies = []
+    wire_bytes = 0
+    for _ in range(requests):
+        started = time.perf_counter()
+        response = await client.get(url, headers={"Accept-Encoding": encoding})
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        wire_bytes = response.num_bytes_downloaded
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p99": latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000,
+        "bytes": wire_bytes
+    }
+
+async def main(args):
+    bootstrap()
+    seed(args.rows)
+    await server.startup_event()
+
+    encodings = ["identity", "gzip"] + (["br"] if compression.brotli is not None else [])
+    token = server.create_access_token({"sub": "admin"})
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Authorization": f"Bearer {token}"}, timeout=None) as client:
+        print(f"{args.rows} rows, {args.requests} requests each")
+        print(f"{'endpoint':<32} {'encoding':>8} {'p50 ms':>8} {'p99 ms':>8} {'bytes':>10}")
+        for label, url in (
+            ("employees (per-row models)", "/bench/legacy/employees"),
+            ("employees (fast path)", "/api/employees"),
+            ("employee report (encoder)", "/bench/legacy/reports/employee"),
+            ("employee report (fast path)", "/api/reports/employee"),
+        ):
+            for encoding in encodings:
+                await measure(client, url, encoding, 2)  # warm-up
+                result = await measure(client, url, encoding, args.requests)
+                print(f"{label:<32} {encoding:>8} {result['p50']:>8.1f} {result['p99']:>8.1f} {result['bytes']:>10}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
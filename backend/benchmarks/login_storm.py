@@ -0,0 +1,117 @@
+"""
+Billing latency during a login storm.
+Creates bills in-process at a fixed concurrency while a crowd of counters
+keeps logging in, once with bcrypt verified inline on the event loop (the
+previous login handler) and once through the bounded password pool, and
+prints billing p50/p95 next to a quiet baseline plus how the logins fared.
+
+    python benchmarks/login_storm.py --logins 32 --requests 200
+
+Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "login_storm.db"))
+os.environ.setdefault("SECRET_KEY", "benchmark")
+os.environ.setdefault("HRMS_API_URL", "http://127.0.0.1:9/")
+os.environ.setdefault("HRMS_API_TOKEN", "benchmark")
+
+import httpx
+from fastapi import Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+
+from bootstrap import DEFAULT_USERS, bootstrap
+from config import settings
+from models import User
+from passwords import verify_password
+import server
+
+COMPANIES = ["Refex Industries Limited", "Refex Green Mobility Limited", "Sparzana", "Refex Holding Private Limited"]
+
+# The pre-pool handler, for comparison
+@server.app.post("/bench/legacy/login")
+async def legacy_login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(server.get_db)):
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    user = result.scalars().first()
+    if not user or not verify_password(form_data.password, user.hashed_password):
+        raise HTTPException(status_code=401)
+    return {"access_token": server.create_access_token(server.token_claims(user)), "token_type": "bearer"}
+
+def bill_payload(run: str, n: int) -> dict:
+    return {
+        "date": "2025-02-01",
+        "time": "12:30 PM",
+        "customer": {"employeeId": f"{run}-{n}", "employeeName": f"Load {n}", "companyName": COMPANIES[n % len(COMPANIES)]},
+        "items": [{"name": "Lunch", "price": 48, "quantity": 1}],
+        "total_items": 1,
+        "total_amount": 48.0
+    }
+
+async def login_storm(client: httpx.AsyncClient, url: str, logins: int, stop: asyncio.Event) -> dict:
+    outcomes = {}
+    credentials = [{"username": user["username"], "password": user["password"]} for user in DEFAULT_USERS]
+
+    async def counter(n: int):
+        while not stop.is_set():
+            response = await client.post(url, data=credentials[n % len(credentials)])
+            outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+            if response.status_code == 503:
+                await asyncio.sleep(0.05)
+
+    await asyncio.gather(*(counter(n) for n in range(logins)))
+    return outcomes
+
+async def billing_run(client: httpx.AsyncClient, run: str, total: int, concurrency: int) -> dict:
+    latencies = []
+    counter = iter(range(total))
+
+    async def worker():
+        for n in counter:
+            started = time.perf_counter()
+            response = await client.post("/api/billing/create", json=bill_payload(run, n))
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies) * 1000,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] * 1000
+    }
+
+async def main(args):
+    bootstrap()
+    await server.startup_event()
+
+    token = server.create_access_token({"sub": "admin"})
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", headers={"Authorization": f"Bearer {token}"}, timeout=None) as client:
+        print(f"bcrypt rounds {settings.BCRYPT_ROUNDS}, {settings.PASSWORD_HASH_WORKERS} password workers, "
+              f"{settings.PASSWORD_HASH_MAX_PENDING} max pending; {args.logins} counters logging in")
+        print(f"{'logins':<22} {'bill p50 ms':>11} {'bill p95 ms':>11}  login responses")
+        await billing_run(client, "warmup", 20, args.concurrency)
+        for label, url in (("none", None), ("inline bcrypt", "/bench/legacy/login"), ("password pool", "/api/auth/login")):
+            stop = asyncio.Event()
+            storm = asyncio.create_task(login_storm(client, url, args.logins, stop)) if url else None
+            result = await billing_run(client, label.replace(" ", "-"), args.requests, args.concurrency)
+            stop.set()
+            outcomes = await storm if storm else {}
+            summary = ", ".join(f"{code}: {count}" for code, count in sorted(outcomes.items())) or "-"
+            print(f"{label:<22} {result['p50']:>11.1f} {result['p95']:>11.1f}  {summary}")
+    server.password_workers.shutdown()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--logins", type=int, default=32, help="counters logging in concurrently")
+    parser.add_argument("--requests", type=int, default=200, help="bills created per run")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent billing clients")
+    asyncio.run(main(parser.parse_args()))
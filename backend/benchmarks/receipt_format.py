@@ -0,0 +1,121 @@
+"""
+Receipt formatting cost.
+Formats batches of kitchen tickets with the previous bytes-concatenation
+formatter and with the precompiled ESC/POS template, and prints time per
+receipt plus traced allocations per batch.
+
+    python benchmarks/receipt_format.py --tickets 1000 --rounds 20
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from escpos import ESCPOSCommands, receipt_template
+from print_server import ReceiptData
+
+def format_receipt_concat(data: ReceiptData) -> bytes:
+    """The formatter the template replaced, kept as the baseline"""
+    cmd = ESCPOSCommands
+    receipt = b''
+    receipt += cmd.INIT
+    receipt += cmd.ALIGN_CENTER + cmd.BOLD_ON
+    receipt += b'KITCHEN PRINT' + cmd.FEED_LINE
+    receipt += data.location.encode('utf-8') + cmd.FEED_LINE
+    receipt += cmd.DOUBLE_HEIGHT
+    receipt += f'***Bill No. - {data.billNumber}***'.encode('utf-8') + cmd.FEED_LINE
+    receipt += cmd.NORMAL + cmd.BOLD_OFF
+    receipt += b'================================' + cmd.FEED_LINE
+    receipt += cmd.ALIGN_LEFT
+    receipt += f'Customer: {data.customerName}'.encode('utf-8') + cmd.FEED_LINE
+    receipt += f'ID: {data.customerId}'.encode('utf-8') + cmd.FEED_LINE
+    receipt += f'Created by: {data.createdBy}'.encode('utf-8') + cmd.FEED_LINE
+    receipt += f'DATE: {data.date}  TIME: {data.time}'.encode('utf-8') + cmd.FEED_LINE
+    receipt += b'================================' + cmd.FEED_LINE
+    receipt += cmd.BOLD_ON
+    receipt += b'Item Name              QTY' + cmd.FEED_LINE
+    receipt += b'--------------------------------' + cmd.FEED_LINE
+    receipt += cmd.BOLD_OFF
+    for item in data.items:
+        name = item['name'].upper()[:22].ljust(22)
+        qty = str(item['quantity']).rjust(4)
+        receipt += f'{name} {qty}'.encode('utf-8') + cmd.FEED_LINE
+    receipt += b'================================' + cmd.FEED_LINE
+    receipt += cmd.FEED_LINE
+    receipt += cmd.ALIGN_CENTER
+    receipt += cmd.BOLD_ON
+    receipt += b'Thank you!' + cmd.FEED_LINE
+    receipt += cmd.BOLD_OFF
+    receipt += b'Powered by Refex POS System' + cmd.FEED_LINE
+    receipt += cmd.FEED_LINE + cmd.FEED_LINE + cmd.FEED_LINE
+    receipt += cmd.CUT_PAPER
+    return receipt
+
+def make_tickets(count: int) -> list:
+    return [
+        ReceiptData(
+            billNumber=str(100000 + i),
+            customerName=f"Employee {i}",
+            customerId=f"RFX{i:05d}",
+            createdBy="counter1",
+            date="15/10/2025",
+            time="12:30 PM",
+            items=[{"name": "Lunch", "quantity": 1}] + ([{"name": "Breakfast", "quantity": 2}] if i % 3 == 0 else [])
+        )
+        for i in range(count)
+    ]
+
+def run_batch(format_batch, tickets):
+    started = time.perf_counter()
+    format_batch(tickets)
+    return time.perf_counter() - started
+
+def traced_batch(format_batch, tickets):
+    """Allocated blocks and peak bytes for one batch"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = format_batch(tickets)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+    return blocks, peak
+
+def main(args):
+    tickets = make_tickets(args.tickets)
+    template = receipt_template(args.width)
+
+    if args.width == 32:
+        assert all(template.render(t) == format_receipt_concat(t) for t in tickets[:50]), "template output differs"
+
+    def shared_buffer(batch):
+        buf = bytearray()
+        for t in batch:
+            template.render_into(buf, t)
+        return buf
+
+    variants = (
+        ("bytes concatenation", lambda batch: [format_receipt_concat(t) for t in batch]),
+        ("template, per ticket", lambda batch: [template.render(t) for t in batch]),
+        ("template, shared buffer", shared_buffer),
+    )
+
+    print(f"{args.tickets} tickets per batch, width {args.width}, best of {args.rounds}")
+    print(f"{'formatter':<26} {'us/receipt':>10} {'blocks/batch':>13} {'peak KiB':>9}")
+    for label, format_batch in variants:
+        run_batch(format_batch, tickets)  # warm-up
+        best = min(run_batch(format_batch, tickets) for _ in range(args.rounds))
+        blocks, peak = traced_batch(format_batch, tickets)
+        print(f"{label:<26} {best / args.tickets * 1e6:>10.2f} {blocks:>13} {peak / 1024:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tickets", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--width", type=int, default=32)
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+"""
+Backend startup time.
+Starts fresh interpreters that import server and run the app's startup
+handlers, and prints median import and import-to-ready times plus which
+heavy modules were loaded by the time the app was ready.
+
+    python benchmarks/startup_time.py --runs 10
+
+The database is migrated and seeded once up front, as a deploy would with
+bootstrap.py. Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ["httpx", "passlib", "jose", "bcrypt", "qrcode"]
+
+CHILD = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+import server
+imported = time.perf_counter()
+asyncio.run(server.app.router.startup())
+ready = time.perf_counter()
+print(json.dumps({
+    "import": imported - started,
+    "ready": ready - started,
+    "loaded": [name for name in %r if name in sys.modules]
+}))
+""" % (HEAVY_MODULES,)
+
+def run_child(env: dict) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=BACKEND, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main(args):
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite:///" + os.path.join(tempfile.mkdtemp(), "startup_time.db"))
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("HRMS_API_URL", "http://127.0.0.1:9/")
+    env.setdefault("HRMS_API_TOKEN", "benchmark")
+    env["PYTHONPATH"] = BACKEND
+
+    subprocess.run([sys.executable, "bootstrap.py"], cwd=BACKEND, env=env, check=True, capture_output=True)
+    run_child(env)  # warm the OS file cache and bytecode
+
+    runs = [run_child(env) for _ in range(args.runs)]
+    print(f"{args.runs} runs")
+    print(f"{'import ms':>10} {'ready ms':>10}  heavy modules loaded")
+    print(f"{statistics.median(r['import'] for r in runs) * 1000:>10.1f} "
+          f"{statistics.median(r['ready'] for r in runs) * 1000:>10.1f}  {', '.join(runs[-1]['loaded']) or '-'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,46 @@
+"""
+Explicit database setup: schema migrations plus default users and prices.
+Run once per deploy, before starting the API workers, instead of having
+every worker create tables and seed data on boot:
+
+    python bootstrap.py
+"""
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from database import SessionLocal
+from migrations import MIGRATIONS, run_migrations
+from models import PriceMaster, User
+from passwords import get_password_hash
+from pricing import DEFAULT_PRICES
+
+DEFAULT_USERS = [
+    {"username": "admin", "password": "password"},
+    {"username": "refextower", "password": "password"},
+    {"username": "bazullah", "password": "password"},
+]
+
+def seed_defaults(db: Session) -> int:
+    """Create missing default users and the first price version (caller commits)"""
+    created = 0
+    for user_data in DEFAULT_USERS:
+        if db.execute(select(User.id).where(User.username == user_data["username"])).first() is None:
+            db.add(User(username=user_data["username"], hashed_password=get_password_hash(user_data["password"])))
+            created += 1
+    if db.execute(select(PriceMaster.id).limit(1)).first() is None:
+        db.add(PriceMaster(version=1, **DEFAULT_PRICES))
+    return created
+
+def bootstrap() -> int:
+    run_migrations()
+    db = SessionLocal()
+    try:
+        created = seed_defaults(db)
+        db.commit()
+    finally:
+        db.close()
+    return created
+
+if __name__ == "__main__":
+    created = bootstrap()
+    print(f"Applied {len(MIGRATIONS)} migration step(s), created {created} default user(s)")
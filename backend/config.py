@@ -3,11 +3,21 @@ from typing import Optional
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    ASYNC_DATABASE_URL: Optional[str] = None  # Defaults to DATABASE_URL on its async driver
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+    TOKEN_CACHE_MAX_SIZE: int = 10000
+    COMPRESSION_MIN_SIZE: int = 1024  # Smaller responses are sent uncompressed
+    BCRYPT_ROUNDS: int = 12  # Existing hashes at another cost are rehashed on login
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 32  # Logins beyond this get a 503
+    BUSINESS_TIMEZONE: str = "Asia/Kolkata"  # Calendar day for bills and meal limits; matches the frontend
+    DASHBOARD_SNAPSHOT_REFRESH_SECONDS: float = 60  # Live dashboards reload, to catch bills from other workers
     HRMS_API_URL: str
     HRMS_API_TOKEN: str
+    HRMS_MAX_RETIRE_FRACTION: float = 0.2  # Larger drops in one sync are refused as a bad payload
     
     class Config:
         env_file = ".env"
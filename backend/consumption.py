@@ -0,0 +1,157 @@
+"""
+Per-customer daily meal consumption index.
+Keeps one row per (date, customer) so the daily limit check is a single lookup.
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Optional, Tuple
+
+from config import settings
+from models import BillingRecord, DailyConsumption
+from upserts import increment_counters
+
+DAILY_MEAL_LIMIT = 1
+
+BUSINESS_TZ = ZoneInfo(settings.BUSINESS_TIMEZONE)
+
+def business_date() -> str:
+    """Today's date (YYYY-MM-DD) in the business timezone, the day bills are counted against"""
+    return datetime.now(BUSINESS_TZ).strftime("%Y-%m-%d")
+
+def meal_quantities(items, include_exceptions: bool = True) -> dict:
+    """Sum Breakfast/Lunch quantities from a bill's items JSON"""
+    totals = {"breakfast": 0, "lunch": 0}
+    for item in items if isinstance(items, list) else []:
+        if not include_exceptions and item.get('isException'):
+            continue
+        if item.get('name') == 'Breakfast':
+            totals['breakfast'] += item.get('quantity', 0)
+        elif item.get('name') == 'Lunch':
+            totals['lunch'] += item.get('quantity', 0)
+    return totals
+
+def consumption_key(is_guest: bool, is_support_staff: bool, customer) -> Optional[Tuple[str, str]]:
+    """Return (customer_type, customer_id) for a bill, or None for guests"""
+    if is_guest:
+        return None
+    customer = customer if isinstance(customer, dict) else {}
+    if is_support_staff:
+        customer_id = customer.get('staffId')
+        customer_type = "support_staff"
+    else:
+        customer_id = customer.get('employeeId')
+        customer_type = "employee"
+    if not customer_id:
+        return None
+    return customer_type, customer_id
+
+def billing_columns(is_guest: bool, is_support_staff: bool, customer, items) -> dict:
+    """Derive the denormalized BillingRecord report columns from customer/items JSON"""
+    customer = customer if isinstance(customer, dict) else {}
+    key = consumption_key(is_guest, is_support_staff, customer)
+    meals = meal_quantities(items)
+    exceptions = {
+        meal: meals[meal] - quantity
+        for meal, quantity in meal_quantities(items, include_exceptions=False).items()
+    }
+    return {
+        "customer_id": key[1] if key else None,
+        "customer_name": customer.get('employeeName') or customer.get('name') or '',
+        "company_name": customer.get('companyName'),
+        "breakfast_qty": meals['breakfast'],
+        "lunch_qty": meals['lunch'],
+        "breakfast_exception_qty": exceptions['breakfast'],
+        "lunch_exception_qty": exceptions['lunch']
+    }
+
+def consumption_totals(bills) -> dict:
+    """Sum non-exception meals per (date, customer_type, customer_id) over bills"""
+    totals = {}
+    for bill in bills:
+        key = consumption_key(bill.is_guest, bill.is_support_staff, bill.customer)
+        if key is None:
+            continue
+        meals = meal_quantities(bill.items, include_exceptions=False)
+        entry = totals.setdefault((bill.date,) + key, {"breakfast": 0, "lunch": 0})
+        entry['breakfast'] += meals['breakfast']
+        entry['lunch'] += meals['lunch']
+    return {key: meals for key, meals in totals.items() if meals['breakfast'] or meals['lunch']}
+
+async def record_consumptions(db: AsyncSession, bills):
+    """Add bills' non-exception meals to the daily index in one round-trip (caller commits)"""
+    totals = consumption_totals(bills)
+    await increment_counters(
+        db,
+        DailyConsumption.__table__,
+        ("date", "customer_type", "customer_id"),
+        ("breakfast", "lunch"),
+        [
+            {
+                "date": date,
+                "customer_type": customer_type,
+                "customer_id": customer_id,
+                "breakfast": meals['breakfast'],
+                "lunch": meals['lunch']
+            }
+            for (date, customer_type, customer_id), meals in totals.items()
+        ],
+        extra_updates={"updated_at": func.now()}
+    )
+
+async def record_consumption(db: AsyncSession, bill: BillingRecord):
+    """Add a bill's non-exception meals to the daily index (caller commits)"""
+    await record_consumptions(db, [bill])
+
+async def get_consumption(db: AsyncSession, date: str, customer_type: str, customer_id: str) -> dict:
+    """Look up how many meals a customer has consumed on a given date"""
+    result = await db.execute(
+        select(DailyConsumption.breakfast, DailyConsumption.lunch).where(
+            DailyConsumption.date == date,
+            DailyConsumption.customer_type == customer_type,
+            DailyConsumption.customer_id == customer_id
+        )
+    )
+    row = result.first()
+    if row is None:
+        return {"breakfast": 0, "lunch": 0}
+    return {"breakfast": row.breakfast, "lunch": row.lunch}
+
+def rebuild_daily_consumption(db: Session) -> int:
+    """Rebuild the daily index from billing history"""
+    db.query(DailyConsumption).delete()
+
+    totals = consumption_totals(db.query(
+        BillingRecord.date,
+        BillingRecord.is_guest,
+        BillingRecord.is_support_staff,
+        BillingRecord.customer,
+        BillingRecord.items
+    ).yield_per(1000))
+
+    db.bulk_insert_mappings(DailyConsumption, [
+        {
+            "date": date,
+            "customer_type": customer_type,
+            "customer_id": customer_id,
+            "breakfast": meals['breakfast'],
+            "lunch": meals['lunch']
+        }
+        for (date, customer_type, customer_id), meals in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+if __name__ == "__main__":
+    from database import SessionLocal, Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        count = rebuild_daily_consumption(db)
+        print(f"Rebuilt daily consumption index: {count} customer-days")
+    finally:
+        db.close()
@@ -0,0 +1,123 @@
+"""
+Live dashboard updates over Server-Sent Events.
+Billing publishes the rollup changes of bills it has committed; one in-process
+broadcaster fans them out to every open stream in scope. The broadcaster only
+sees bills created by its own API worker, so each stream also reloads its
+snapshot every DASHBOARD_SNAPSHOT_REFRESH_SECONDS (and at once if a slow client falls
+behind); bills from other workers show up within that interval.
+"""
+import asyncio
+import json
+from typing import Awaitable, Callable, Optional, Set
+
+from fastapi.responses import StreamingResponse
+
+from config import settings
+
+# Deltas a client may fall behind by before it gets a fresh snapshot instead
+MAX_PENDING_DELTAS = 100
+HEARTBEAT_SECONDS = 15
+
+STAT_KEYS = {"employee": "employee", "support_staff": "supportStaff", "guest": "guest"}
+
+class DashboardSubscription:
+    def __init__(self, created_by: Optional[str], start_date: Optional[str], end_date: Optional[str]):
+        # created_by None means every counter's bills (admin)
+        self.created_by = created_by
+        self.start_date = start_date
+        self.end_date = end_date
+        self.queue: asyncio.Queue = asyncio.Queue(MAX_PENDING_DELTAS)
+        self.lagging = False
+
+    def wants(self, date: str, created_by: str) -> bool:
+        if self.created_by is not None and created_by != self.created_by:
+            return False
+        if self.start_date and date < self.start_date:
+            return False
+        if self.end_date and date > self.end_date:
+            return False
+        return True
+
+class DashboardBroadcaster:
+    def __init__(self):
+        self.subscribers: Set[DashboardSubscription] = set()
+
+    def subscribe(self, created_by: Optional[str], start_date: Optional[str], end_date: Optional[str]) -> DashboardSubscription:
+        subscription = DashboardSubscription(created_by, start_date, end_date)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: DashboardSubscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, totals: dict):
+        """Fan out committed rollup totals ({(date, created_by, company, customer_type, meal): qty})"""
+        if not totals or not self.subscribers:
+            return
+        for subscription in list(self.subscribers):
+            changes = [
+                {
+                    "meal": meal,
+                    "category": STAT_KEYS[customer_type],
+                    "companyName": company,
+                    "quantity": quantity
+                }
+                for (date, created_by, company, customer_type, meal), quantity in totals.items()
+                if subscription.wants(date, created_by)
+            ]
+            if not changes or subscription.lagging:
+                continue
+            try:
+                subscription.queue.put_nowait(changes)
+            except asyncio.QueueFull:
+                subscription.lagging = True
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+async def _events(broadcaster: DashboardBroadcaster, subscription: DashboardSubscription, snapshot: dict,
+                  load_snapshot: Callable[[], Awaitable[dict]], refresh_seconds: float = None):
+    refresh_seconds = refresh_seconds or settings.DASHBOARD_SNAPSHOT_REFRESH_SECONDS
+    loop = asyncio.get_running_loop()
+    
+    async def fresh_snapshot() -> str:
+        # Deltas still queued are already counted in the new snapshot
+        while not subscription.queue.empty():
+            subscription.queue.get_nowait()
+        subscription.lagging = False
+        return sse_event("snapshot", await load_snapshot())
+    
+    try:
+        yield sse_event("snapshot", snapshot)
+        refresh_at = loop.time() + refresh_seconds
+        while True:
+            # Checked first, so a steady flow of deltas can't postpone it
+            if subscription.lagging or loop.time() >= refresh_at:
+                yield await fresh_snapshot()
+                refresh_at = loop.time() + refresh_seconds
+                continue
+            try:
+                changes = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_SECONDS, refresh_at - loop.time()))
+            except asyncio.TimeoutError:
+                if loop.time() < refresh_at:
+                    # Comment line keeps proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                continue
+            if subscription.lagging:
+                continue
+            # Coalesce whatever else arrived while we were waiting
+            while not subscription.queue.empty():
+                changes = changes + subscription.queue.get_nowait()
+            yield sse_event("delta", {"changes": changes})
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+def stream_dashboard(broadcaster: DashboardBroadcaster, subscription: DashboardSubscription, snapshot: dict,
+                     load_snapshot: Callable[[], Awaitable[dict]]) -> StreamingResponse:
+    return StreamingResponse(
+        _events(broadcaster, subscription, snapshot, load_snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+dashboard_broadcaster = DashboardBroadcaster()
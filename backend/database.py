@@ -1,9 +1,27 @@
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from config import settings
+from metrics import instrument_engine
 
-# Create MySQL engine
+# Async driver used by the API for each sync driver we may be configured with
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+mysqlconnector": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url: str) -> str:
+    """Map DATABASE_URL onto the matching async driver (aiomysql / aiosqlite)"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+# Create MySQL engine (used by migrations, backfills and bulk background jobs)
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
@@ -13,4 +31,27 @@ engine = create_engine(
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+
+# SQLite has a single writer and fails concurrent lock upgrades with "database is
+# locked", so hand out one connection at a time and let requests queue on the pool
+async_pool_options = {}
+if make_url(ASYNC_DATABASE_URL).get_backend_name() == "sqlite" and ":memory:" not in ASYNC_DATABASE_URL:
+    async_pool_options = {"poolclass": AsyncAdaptedQueuePool, "pool_size": 1, "max_overflow": 0}
+
+# Async engine for request handlers, so DB round-trips never block the event loop
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_pre_ping=True,
+    pool_recycle=3600,
+    echo=False,
+    **async_pool_options
+)
+
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Query timings and pool waits for /metrics
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "async")
+
+Base = declarative_base()
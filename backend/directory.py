@@ -0,0 +1,262 @@
+"""
+In-process search index over employees, support staff and guests.
+Built from slim master-data columns and rebuilt lazily after writes,
+so counter autocomplete and badge scans never need the whole directory client-side.
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, List, NamedTuple, Optional, Set
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database import AsyncSessionLocal
+from models import Employee, SupportStaff, Guest
+
+logger = logging.getLogger(__name__)
+
+# Rebuild at least this often so writes made by other workers are picked up
+INDEX_MAX_AGE_SECONDS = 300
+
+class DirectoryEntry(NamedTuple):
+    type: str  # "employee", "support_staff" or "guest"
+    id: int
+    code: Optional[str]
+    name: str
+    company_name: Optional[str]
+    location: Optional[str] = None
+    designation: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "type": self.type,
+            "id": self.id,
+            "code": self.code,
+            "name": self.name,
+            "companyName": self.company_name,
+            "location": self.location,
+            "designation": self.designation
+        }
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+class DirectoryIndex:
+    """Sorted-prefix terms for short queries, trigram postings for substrings"""
+
+    def __init__(self, entries: List[DirectoryEntry]):
+        self.entries = entries
+        self.by_code: Dict[str, DirectoryEntry] = {}
+        self.haystacks = []
+        self.trigrams: Dict[str, Set[int]] = {}
+        field_positions: Dict[str, List[int]] = {}
+        term_positions: Dict[str, List[int]] = {}
+
+        for position, entry in enumerate(entries):
+            # Employees win if HRMS ever reuses an ID for a support staff record
+            if entry.code and (entry.type == "employee" or entry.code.lower() not in self.by_code):
+                self.by_code[entry.code.lower()] = entry
+            fields = [f.lower() for f in (entry.code, entry.name, entry.company_name) if f]
+            self.haystacks.append(fields)
+            for field in fields:
+                field_positions.setdefault(field, []).append(position)
+
+        # Company names repeat across thousands of rows, so split each distinct value once
+        for field, positions in field_positions.items():
+            for term in [field] + field.split()[1:]:
+                term_positions.setdefault(term, []).extend(positions)
+            for gram in _trigrams(field):
+                self.trigrams.setdefault(gram, set()).update(positions)
+
+        self.terms = sorted(term_positions)
+        self.term_positions = [term_positions[term] for term in self.terms]
+
+    def lookup(self, code: str) -> Optional[DirectoryEntry]:
+        return self.by_code.get(code.strip().lower())
+
+    def _prefix_candidates(self, query: str, cap: int, types: Optional[Set[str]] = None) -> List[int]:
+        start = bisect_left(self.terms, query)
+        positions = []
+        seen = set()
+        for i in range(start, len(self.terms)):
+            if not self.terms[i].startswith(query):
+                break
+            for position in self.term_positions[i]:
+                if types and self.entries[position].type not in types:
+                    continue
+                if position not in seen:
+                    seen.add(position)
+                    positions.append(position)
+                    if len(positions) >= cap:
+                        return positions
+        return positions
+
+    def _substring_candidates(self, query: str, exclude: Set[int], cap: int, types: Optional[Set[str]] = None) -> List[int]:
+        postings = sorted((self.trigrams.get(gram, set()) for gram in _trigrams(query)), key=len)
+        if not postings or not postings[0]:
+            return []
+        candidates = postings[0].intersection(*postings[1:]) - exclude
+        # Trigram hits can span field boundaries, so confirm the real substring
+        positions = []
+        for position in candidates:
+            if types and self.entries[position].type not in types:
+                continue
+            if any(query in field for field in self.haystacks[position]):
+                positions.append(position)
+                if len(positions) >= cap:
+                    break
+        return positions
+
+    def _rank(self, position: int, query: str) -> tuple:
+        entry = self.entries[position]
+        code = (entry.code or "").lower()
+        name = entry.name.lower()
+        if code == query:
+            rank = 0
+        elif code.startswith(query) or name.startswith(query):
+            rank = 1
+        elif any(word.startswith(query) for word in name.split()):
+            rank = 2
+        else:
+            rank = 3
+        return (rank, name)
+
+    def search(self, query: str, limit: int = 20, types: Optional[Set[str]] = None) -> List[DirectoryEntry]:
+        query = query.strip().lower()
+        if not query:
+            return []
+
+        # Prefix hits always outrank plain substring hits, so only fall back to
+        # trigrams when there aren't enough of them to fill the page
+        # The type filter runs before the cap, so filtered searches still fill the page
+        cap = max(limit * 10, 200)
+        positions = self._prefix_candidates(query, cap, types)
+        positions.sort(key=lambda p: self._rank(p, query))
+
+        if len(positions) < limit and len(query) >= 3:
+            extra = self._substring_candidates(query, set(positions), cap, types)
+            extra.sort(key=lambda p: self._rank(p, query))
+            positions.extend(extra)
+
+        return [self.entries[p] for p in positions[:limit]]
+
+async def load_directory_entries(db: AsyncSession) -> List[DirectoryEntry]:
+    employees = await db.execute(
+        select(Employee.id, Employee.employee_id, Employee.employee_name, Employee.company_name, Employee.location)
+        .where(Employee.is_active == True)
+    )
+    entries = [
+        DirectoryEntry("employee", row.id, row.employee_id, row.employee_name, row.company_name, location=row.location)
+        for row in employees
+    ]
+    staff = await db.execute(
+        select(SupportStaff.id, SupportStaff.staff_id, SupportStaff.name, SupportStaff.company_name, SupportStaff.designation)
+        .where(SupportStaff.is_active == True)
+    )
+    entries.extend(
+        DirectoryEntry("support_staff", row.id, row.staff_id, row.name, row.company_name, designation=row.designation)
+        for row in staff
+    )
+    guests = await db.execute(select(Guest.id, Guest.name, Guest.company_name))
+    entries.extend(
+        DirectoryEntry("guest", row.id, None, row.name, row.company_name)
+        for row in guests
+    )
+    return entries
+
+async def load_directory_entry(db: AsyncSession, code: str) -> Optional[DirectoryEntry]:
+    """Point lookup by employee_id/staff_id, used while the index is being rebuilt.
+    Case-insensitive like DirectoryIndex.lookup, so answers don't change across a rebuild.
+    """
+    code = code.lower()
+    result = await db.execute(
+        select(Employee.id, Employee.employee_id, Employee.employee_name, Employee.company_name, Employee.location)
+        .where(func.lower(Employee.employee_id) == code, Employee.is_active == True)
+        .limit(1)
+    )
+    row = result.first()
+    if row:
+        return DirectoryEntry("employee", row.id, row.employee_id, row.employee_name, row.company_name, location=row.location)
+    result = await db.execute(
+        select(SupportStaff.id, SupportStaff.staff_id, SupportStaff.name, SupportStaff.company_name, SupportStaff.designation)
+        .where(func.lower(SupportStaff.staff_id) == code, SupportStaff.is_active == True)
+        .limit(1)
+    )
+    row = result.first()
+    if row:
+        return DirectoryEntry("support_staff", row.id, row.staff_id, row.name, row.company_name, designation=row.designation)
+    return None
+
+class DirectoryCache:
+    """Process-wide directory index. After invalidate() the old index keeps serving
+    searches while a new one is built in the background; only the first build is awaited."""
+
+    def __init__(self, max_age: float = INDEX_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._index: Optional[DirectoryIndex] = None
+        self._built_at = 0.0
+        self._generation = 0
+        # Generation of the writes the published index already reflects
+        self._built_generation = -1
+        self._lock = asyncio.Lock()
+        self._rebuild: Optional[asyncio.Task] = None
+
+    def invalidate(self):
+        self._generation += 1
+
+    def _fresh(self) -> Optional[DirectoryIndex]:
+        index = self._index
+        if (index is not None and self._built_generation == self._generation
+                and time.monotonic() - self._built_at < self.max_age):
+            return index
+        return None
+
+    def peek(self) -> Optional[DirectoryIndex]:
+        """Current index if it is fresh, without ever building one"""
+        return self._fresh()
+
+    async def refresh(self):
+        """Make sure a fresh index exists (startup warm-up / background tasks)"""
+        await self.get()
+
+    async def current(self) -> DirectoryIndex:
+        """Index for search: a stale one is returned at once while it is rebuilt"""
+        index = self._fresh()
+        if index is not None:
+            return index
+        if self._index is None:
+            return await self.get()
+        if self._rebuild is None or self._rebuild.done():
+            self._rebuild = asyncio.get_running_loop().create_task(self._background_refresh())
+        return self._index
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception:
+            logger.exception("Directory index rebuild failed; serving the previous index")
+
+    async def get(self) -> DirectoryIndex:
+        """Fresh index, built inline if needed"""
+        index = self._fresh()
+        if index is not None:
+            return index
+        async with self._lock:
+            index = self._fresh()
+            if index is None:
+                generation = self._generation
+                async with AsyncSessionLocal() as db:
+                    entries = await load_directory_entries(db)
+                # Building takes a while on large directories, keep it off the event loop
+                index = await run_in_threadpool(DirectoryIndex, entries)
+                # Always newer than what is published; it only counts as fresh if no
+                # write landed during the build
+                self._index = index
+                self._built_at = time.monotonic()
+                self._built_generation = generation
+            return index
+
+directory_cache = DirectoryCache()
@@ -0,0 +1,95 @@
+"""
+ESC/POS commands and precompiled receipt templates.
+Everything static on a ticket (header, separators, column headings, footer,
+cut) is encoded once per paper width; rendering only appends those cached
+segments and the encoded dynamic fields to a single bytearray.
+"""
+from functools import lru_cache
+
+# ESC/POS Commands
+ESC = b'\x1b'
+GS = b'\x1d'
+
+class ESCPOSCommands:
+    """ESC/POS command constants for thermal printer"""
+    INIT = ESC + b'@'                    # Initialize printer
+    ALIGN_CENTER = ESC + b'a' + b'\x01'  # Center alignment
+    ALIGN_LEFT = ESC + b'a' + b'\x00'    # Left alignment
+    BOLD_ON = ESC + b'E' + b'\x01'       # Bold text on
+    BOLD_OFF = ESC + b'E' + b'\x00'      # Bold text off
+    DOUBLE_HEIGHT = ESC + b'!' + b'\x10' # Double height text
+    DOUBLE_WIDTH = ESC + b'!' + b'\x20'  # Double width text
+    NORMAL = ESC + b'!' + b'\x00'        # Normal text
+    CUT_PAPER = GS + b'V' + b'\x00'      # Full cut
+    FEED_LINE = b'\n'                    # Line feed
+
+# Characters per line: 32 for 58mm paper, 48 for 80mm
+DEFAULT_PAPER_WIDTH = 32
+QTY_WIDTH = 4
+
+class ReceiptTemplate:
+    """Kitchen ticket layout compiled for one paper width"""
+
+    def __init__(self, width: int = DEFAULT_PAPER_WIDTH):
+        if width < QTY_WIDTH + 8:
+            raise ValueError(f"Paper width {width} is too narrow for a receipt")
+        cmd = ESCPOSCommands
+        nl = cmd.FEED_LINE
+        rule = b'=' * width + nl
+
+        self.width = width
+        self.name_width = width - QTY_WIDTH - 6
+
+        self.header = cmd.INIT + cmd.ALIGN_CENTER + cmd.BOLD_ON + b'KITCHEN PRINT' + nl
+        self.bill_prefix = nl + cmd.DOUBLE_HEIGHT + b'***Bill No. - '
+        self.customer_prefix = b'***' + nl + cmd.NORMAL + cmd.BOLD_OFF + rule + cmd.ALIGN_LEFT + b'Customer: '
+        self.id_prefix = nl + b'ID: '
+        self.created_by_prefix = nl + b'Created by: '
+        self.date_prefix = nl + b'DATE: '
+        self.time_prefix = b'  TIME: '
+        self.items_header = (
+            nl + rule
+            + cmd.BOLD_ON
+            + b'Item Name'.ljust(self.name_width + 1) + b'QTY' + nl
+            + b'-' * width + nl
+            + cmd.BOLD_OFF
+        )
+        self.footer = (
+            rule + nl
+            + cmd.ALIGN_CENTER + cmd.BOLD_ON + b'Thank you!' + nl + cmd.BOLD_OFF
+            + b'Powered by Refex POS System' + nl
+            + nl + nl + nl
+            + cmd.CUT_PAPER
+        )
+
+    def render_into(self, buf: bytearray, data) -> bytearray:
+        """Append one ticket to buf in place (several tickets can share a buffer)"""
+        buf += self.header
+        buf += data.location.encode('utf-8')
+        buf += self.bill_prefix
+        buf += str(data.billNumber).encode('utf-8')
+        buf += self.customer_prefix
+        buf += data.customerName.encode('utf-8')
+        buf += self.id_prefix
+        buf += data.customerId.encode('utf-8')
+        buf += self.created_by_prefix
+        buf += data.createdBy.encode('utf-8')
+        buf += self.date_prefix
+        buf += data.date.encode('utf-8')
+        buf += self.time_prefix
+        buf += data.time.encode('utf-8')
+        buf += self.items_header
+        name_width = self.name_width
+        for item in data.items:
+            name = item['name'].upper()[:name_width].ljust(name_width)
+            qty = str(item['quantity']).rjust(QTY_WIDTH)
+            buf += f'{name} {qty}\n'.encode('utf-8')
+        buf += self.footer
+        return buf
+
+    def render(self, data) -> bytearray:
+        return self.render_into(bytearray(), data)
+
+@lru_cache(maxsize=None)
+def receipt_template(width: int = DEFAULT_PAPER_WIDTH) -> ReceiptTemplate:
+    return ReceiptTemplate(width)
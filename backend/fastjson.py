@@ -0,0 +1,39 @@
+"""
+Fast JSON responses for large list endpoints.
+Endpoints opt in by returning FastJSONResponse with plain dicts built from
+selected row tuples; that skips per-row Pydantic models and FastAPI's
+jsonable_encoder pass. orjson is used when installed, otherwise the stdlib
+encoder produces the same JSON more slowly.
+"""
+import datetime
+import json
+from decimal import Decimal
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional; stdlib json fallback
+    orjson = None
+
+def _default(value):
+    # MySQL returns Decimal for SUM(); dates only show up from raw columns
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+def row_dicts(result) -> list:
+    """Rows of a select() of labelled columns as dicts keyed by label"""
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
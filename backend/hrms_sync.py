@@ -0,0 +1,242 @@
+"""
+Batched HRMS sync engine.
+Diffs the HRMS payload against existing employees/support staff with one query
+per table and applies inserts, updates and soft-deletes in chunks. Each row
+keeps a hash of the HRMS fields last applied, so unchanged records are skipped.
+HRMS pages are normalized as they arrive, so only the trimmed column values of
+the whole directory are held in memory, never the raw responses.
+"""
+import hashlib
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urljoin
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Employee, SupportStaff
+
+logger = logging.getLogger(__name__)
+
+SUPPORT_STAFF_DESIGNATIONS = ['Driver', 'Office Assistant']
+HRMS_CREATED_BY = 'HRMS Sync'
+
+# Safety stop for a looping 'next' link
+MAX_HRMS_PAGES = 10000
+
+def payload_hash(data) -> str:
+    return hashlib.sha1(json.dumps(data, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def normalize_hrms_record(emp: dict) -> Tuple[type, str, dict]:
+    """Map one HRMS record to (model, business key, column values)"""
+    designation = emp.get('designation') or ''
+    company_name = (emp.get('company') or {}).get('company_name', '')
+    is_support = any(d.lower() in designation.lower() for d in SUPPORT_STAFF_DESIGNATIONS)
+
+    if is_support:
+        staff_id = emp.get('employee_id') or ''
+        return SupportStaff, staff_id, {
+            "staff_id": staff_id,
+            "name": emp.get('employee_name', ''),
+            "designation": designation,
+            "company_name": company_name,
+            "biometric_data": emp.get('qr_code_image', '')
+        }
+
+    employee_id = emp.get('employee_id') or ''
+    return Employee, employee_id, {
+        "employee_id": employee_id,
+        "employee_name": emp.get('employee_name', ''),
+        "company_name": company_name,
+        "entity": designation,
+        "mobile_number": emp.get('mobile_number', ''),
+        "location": (emp.get('branch') or {}).get('branch_name', ''),
+        "qr_code": emp.get('qr_code_image', '')
+    }
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+class HrmsPayload:
+    """Normalized HRMS records by model and business key, filled page by page"""
+
+    def __init__(self, hrms_records: Iterable[dict] = ()):
+        self.records: Dict[type, Dict[str, dict]] = {Employee: {}, SupportStaff: {}}
+        self.received = 0
+        self.add(hrms_records)
+
+    def add(self, hrms_records: Iterable[dict]):
+        for emp in hrms_records:
+            self.received += 1
+            model, key, values = normalize_hrms_record(emp)
+            if key:
+                self.records[model][key] = values
+
+class HrmsSyncResult:
+    def __init__(self):
+        self.inserted = {Employee: 0, SupportStaff: 0}
+        self.updated = 0
+        self.unchanged = 0
+        self.removed = 0
+        # Rows that would have been retired but were kept by the retire guard
+        self.retirements_skipped = 0
+        self.warnings: List[str] = []
+
+    def to_dict(self) -> dict:
+        return {
+            "message": "HRMS sync completed" + (" with warnings" if self.warnings else ""),
+            "inserted": sum(self.inserted.values()),
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            "removed": self.removed,
+            "retirements_skipped": self.retirements_skipped,
+            "warnings": self.warnings,
+            "new_employees": self.inserted[Employee],
+            "new_support_staff": self.inserted[SupportStaff]
+        }
+
+def sync_hrms_records(db: Session, hrms_records: Union[HrmsPayload, Iterable[dict]], chunk_size: int = 500,
+                      on_progress=None, max_retire_fraction: float = None) -> HrmsSyncResult:
+    """Apply an HRMS payload and commit.
+
+    on_progress, if given, is called as on_progress(processed, written) after each chunk.
+    Rows HRMS no longer sends are retired only when the payload is non-empty and
+    the active directory would shrink by at most max_retire_fraction
+    (settings.HRMS_MAX_RETIRE_FRACTION by default); otherwise the retirements
+    are skipped and reported as warnings.
+    """
+    result = HrmsSyncResult()
+    key_columns = {Employee: Employee.employee_id, SupportStaff: SupportStaff.staff_id}
+    if max_retire_fraction is None:
+        max_retire_fraction = settings.HRMS_MAX_RETIRE_FRACTION
+
+    payload = hrms_records if isinstance(hrms_records, HrmsPayload) else HrmsPayload(hrms_records)
+    incoming = payload.records
+
+    plans = []
+    for model, records in incoming.items():
+        key_column = key_columns[model]
+        existing = {
+            row.key: row
+            for row in db.query(
+                key_column.label("key"), model.id, model.hrms_hash, model.is_active, model.created_by
+            )
+        }
+
+        inserts = []
+        updates = []
+        for key, values in records.items():
+            values_hash = payload_hash(values)
+            row = existing.get(key)
+            if row is None:
+                inserts.append({**values, "hrms_hash": values_hash, "is_active": True, "created_by": HRMS_CREATED_BY})
+            elif row.hrms_hash != values_hash or not row.is_active:
+                updates.append({**values, "id": row.id, "hrms_hash": values_hash, "is_active": True})
+            else:
+                result.unchanged += 1
+
+        # Only rows that came from HRMS are retired when HRMS stops sending them
+        removed_ids = [
+            row.id for key, row in existing.items()
+            if key not in records and row.is_active
+            and (row.hrms_hash is not None or row.created_by == HRMS_CREATED_BY)
+        ]
+        active = sum(1 for row in existing.values() if row.is_active)
+        plans.append((model, records, inserts, updates, removed_ids, active))
+
+    # An empty, truncated or error payload must not wipe the directory
+    to_retire = sum(len(plan[4]) for plan in plans)
+    active_total = sum(plan[5] for plan in plans)
+    if to_retire:
+        warning = None
+        if not payload.received:
+            warning = f"HRMS returned no records; kept {to_retire} active row(s)"
+        elif to_retire > active_total * max_retire_fraction:
+            warning = (f"HRMS sync would retire {to_retire} of {active_total} active row(s), "
+                       f"more than the {max_retire_fraction:.0%} limit; retirements skipped")
+        if warning:
+            logger.warning(warning)
+            result.warnings.append(warning)
+            result.retirements_skipped = to_retire
+            plans = [plan[:4] + ([], plan[5]) for plan in plans]
+
+    processed = 0
+    written = 0
+    for model, records, inserts, updates, removed_ids, _ in plans:
+        processed += len(records)
+
+        for chunk in _chunks(inserts, chunk_size):
+            db.bulk_insert_mappings(model, chunk)
+            db.flush()
+            written += len(chunk)
+            if on_progress:
+                on_progress(processed, written)
+        for chunk in _chunks(updates, chunk_size):
+            db.bulk_update_mappings(model, chunk)
+            db.flush()
+            written += len(chunk)
+            if on_progress:
+                on_progress(processed, written)
+        for chunk in _chunks(removed_ids, chunk_size):
+            db.query(model).filter(model.id.in_(chunk)).update({model.is_active: False}, synchronize_session=False)
+            db.flush()
+            written += len(chunk)
+            if on_progress:
+                on_progress(processed, written)
+
+        result.inserted[model] = len(inserts)
+        result.updated += len(updates)
+        result.removed += len(removed_ids)
+        if on_progress:
+            on_progress(processed, written)
+
+    db.commit()
+    return result
+
+async def fetch_hrms_payload(url: str, token: str, timeout: float = 30.0,
+                             on_page: Optional[Callable[[int], None]] = None) -> HrmsPayload:
+    """Fetch every HRMS page, following 'next' links until it is null.
+
+    Accepts a bare list or a paginated {"results": [...], "next": url} envelope.
+    Each page is normalized into the payload and dropped before the next is
+    requested. on_page, if given, is called with the number of records received so far.
+    """
+    import httpx  # only the sync job needs it; keeps it out of API startup
+    
+    payload = HrmsPayload()
+    headers = {
+        "Authorization": token,
+        "Content-Type": "application/json",
+        "Accept": "application/json"
+    }
+    async with httpx.AsyncClient() as client:
+        next_url = url
+        for _ in range(MAX_HRMS_PAGES):
+            response = await client.get(next_url, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            page = response.json()
+            if isinstance(page, list):
+                payload.add(page)
+                next_url = None
+            elif isinstance(page, dict) and isinstance(page.get("results"), list):
+                payload.add(page["results"])
+                next_url = urljoin(str(response.url), page["next"]) if page.get("next") else None
+            else:
+                raise ValueError("Unexpected HRMS response: no 'results' list")
+            del page
+            if on_page:
+                on_page(payload.received)
+            if next_url is None:
+                return payload
+    raise ValueError(f"HRMS pagination did not end after {MAX_HRMS_PAGES} pages")
+
+def apply_hrms_sync(hrms_records: Union[HrmsPayload, Iterable[dict]], on_progress=None) -> HrmsSyncResult:
+    """Run a sync on a dedicated session, for use from background jobs"""
+    db = SessionLocal()
+    try:
+        return sync_hrms_records(db, hrms_records, on_progress=on_progress)
+    finally:
+        db.close()
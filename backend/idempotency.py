@@ -0,0 +1,54 @@
+"""
+Recently stored bills by client idempotency key.
+Double-taps and quick retries are answered from memory; older replays fall
+through to the unique client_bill_id index on billing_records. Each key is
+stored with a hash of the bill it was used for, so a key reused for a
+different bill is rejected instead of answered with the wrong bill.
+"""
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# Stamped by the counter's clock when it submits, so they differ between retries
+UNHASHED_BILL_FIELDS = {"client_bill_id", "date", "time"}
+
+def bill_request_hash(bill: dict) -> str:
+    """Hash of the billed content of a create request"""
+    content = {name: value for name, value in bill.items() if name not in UNHASHED_BILL_FIELDS}
+    return hashlib.sha1(json.dumps(content, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+RECENT_BILLS_TTL_SECONDS = 600
+RECENT_BILLS_MAX_SIZE = 10000
+
+class RecentBills:
+    """Bounded LRU of (created_by, client_bill_id) -> (stored bill response, request hash)"""
+
+    def __init__(self, ttl: float = RECENT_BILLS_TTL_SECONDS, max_size: int = RECENT_BILLS_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+    def get(self, created_by: str, client_bill_id: str) -> Optional[Tuple[object, Optional[str]]]:
+        key = (created_by, client_bill_id)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        stored, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return stored
+
+    def put(self, created_by: str, client_bill_id: Optional[str], response, request_hash: Optional[str]):
+        if not client_bill_id:
+            return
+        key = (created_by, client_bill_id)
+        self._entries[key] = ((response, request_hash), time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+recent_bills = RecentBills()
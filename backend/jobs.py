@@ -0,0 +1,226 @@
+"""
+Background job queue.
+Jobs run one at a time on a single asyncio worker per API process; clients poll
+/api/jobs/{id} for progress. Job state is kept in the background_jobs table, so
+any worker can answer a poll and an exclusive kind runs once across workers.
+"""
+import asyncio
+import logging
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from database import SessionLocal
+from models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept in memory for polling (older ones are read back from the database)
+MAX_JOB_HISTORY = 100
+# How often a worker refreshes its active jobs' heartbeat and progress
+JOB_HEARTBEAT_SECONDS = 2.0
+# An active job whose heartbeat is older than this belonged to a worker that died
+JOB_STALE_SECONDS = 60.0
+# Finished job rows are deleted after this long
+JOB_RETENTION = timedelta(days=30)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+class Job:
+    def __init__(self, kind: str, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> completed | failed
+        self.progress = {"fetched": 0, "processed": 0, "written": 0}
+        self.result = None
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+
+    @classmethod
+    def from_row(cls, row: BackgroundJob) -> "Job":
+        job = cls(row.kind, job_id=row.id)
+        job.status = row.status
+        job.progress = dict(row.progress or {})
+        job.result = row.result
+        job.error = row.error
+        job.created_at = row.created_at
+        job.started_at = row.started_at
+        job.finished_at = row.finished_at
+        return job
+
+    @property
+    def active(self) -> bool:
+        return self.status in ACTIVE_STATUSES
+
+    def update_progress(self, **counts):
+        self.progress.update(counts)
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": dict(self.progress),
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at.isoformat(),
+            "startedAt": self.started_at.isoformat() if self.started_at else None,
+            "finishedAt": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+JobFunc = Callable[[Job], Awaitable[Optional[dict]]]
+
+class JobStore:
+    """background_jobs rows; blocking, so async code calls it through a worker thread"""
+
+    def __init__(self, session_factory=SessionLocal, stale_after: float = JOB_STALE_SECONDS,
+                 retention: timedelta = JOB_RETENTION):
+        self.session_factory = session_factory
+        self.stale_after = stale_after
+        self.retention = retention
+
+    def save(self, job: Job):
+        with self.session_factory() as db:
+            db.merge(BackgroundJob(
+                id=job.id,
+                kind=job.kind,
+                status=job.status,
+                progress=dict(job.progress),
+                result=job.result,
+                error=job.error,
+                created_at=job.created_at,
+                started_at=job.started_at,
+                finished_at=job.finished_at,
+                heartbeat_at=datetime.utcnow()
+            ))
+            db.commit()
+
+    def load(self, job_id: str) -> Optional[Job]:
+        with self.session_factory() as db:
+            row = db.get(BackgroundJob, job_id)
+            return Job.from_row(row) if row else None
+
+    def active(self, kind: str) -> Optional[Job]:
+        """Oldest live queued/running job of a kind, on any worker"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        with self.session_factory() as db:
+            row = db.query(BackgroundJob).filter(
+                BackgroundJob.kind == kind,
+                BackgroundJob.status.in_(ACTIVE_STATUSES),
+                BackgroundJob.heartbeat_at >= cutoff
+            ).order_by(BackgroundJob.created_at).first()
+            return Job.from_row(row) if row else None
+
+    def prune(self):
+        cutoff = datetime.utcnow() - self.retention
+        with self.session_factory() as db:
+            db.query(BackgroundJob).filter(
+                BackgroundJob.status.notin_(ACTIVE_STATUSES),
+                BackgroundJob.finished_at < cutoff
+            ).delete(synchronize_session=False)
+            db.commit()
+
+class JobQueue:
+    def __init__(self, store: Optional[JobStore] = None, max_history: int = MAX_JOB_HISTORY,
+                 heartbeat_interval: float = JOB_HEARTBEAT_SECONDS):
+        self.store = store if store is not None else JobStore()
+        self.max_history = max_history
+        self.heartbeat_interval = heartbeat_interval
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job started by this worker"""
+        return self.jobs.get(job_id)
+
+    async def load(self, job_id: str) -> Optional[Job]:
+        """A job started by any worker"""
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        return await run_in_threadpool(self.store.load, job_id)
+
+    def active_job(self, kind: str) -> Optional[Job]:
+        for job in self.jobs.values():
+            if job.kind == kind and job.active:
+                return job
+        return None
+
+    async def submit(self, kind: str, func: JobFunc, exclusive: bool = True) -> Tuple[Job, bool]:
+        """Queue func(job); returns (job, created). Exclusive kinds reuse an active job,
+        including one running on another worker."""
+        if exclusive:
+            existing = self.active_job(kind) or await run_in_threadpool(self.store.active, kind)
+            if existing is not None:
+                return existing, False
+
+        job = Job(kind)
+        await run_in_threadpool(self.store.save, job)
+        self.jobs[job.id] = job
+        self._trim_history()
+        self._ensure_worker()
+        self._queue.put_nowait((job, func))
+        return job, True
+
+    def _trim_history(self):
+        finished = [job_id for job_id, job in self.jobs.items() if not job.active]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_history)]:
+            del self.jobs[job_id]
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.get_running_loop().create_task(self._beat())
+
+    async def _save(self, job: Job):
+        # A failed write only delays what pollers see; it must not fail the job
+        try:
+            await run_in_threadpool(self.store.save, job)
+        except Exception:
+            logger.exception(f"Could not persist job {job.id}")
+
+    async def _beat(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            for job in [job for job in self.jobs.values() if job.active]:
+                await self._save(job)
+
+    async def _run(self):
+        while True:
+            job, func = await self._queue.get()
+            job.status = "running"
+            job.started_at = datetime.utcnow()
+            await self._save(job)
+            try:
+                job.result = await func(job)
+                job.status = "completed"
+            except Exception as e:
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = datetime.utcnow()
+                await self._save(job)
+                self._queue.task_done()
+            try:
+                await run_in_threadpool(self.store.prune)
+            except Exception:
+                logger.exception("Could not prune finished jobs")
+
+    async def shutdown(self):
+        for task in (self._worker, self._heartbeat):
+            if task is not None:
+                task.cancel()
+        self._worker = None
+        self._heartbeat = None
+
+job_queue = JobQueue()
@@ -0,0 +1,250 @@
+"""
+In-process Prometheus-style metrics.
+Counters, histograms and gauges are plain dicts updated in the worker
+process and rendered in the Prometheus text format on GET /metrics, with no
+client library or external service. Each worker process reports its own
+numbers. Used by both the POS API and the printer service.
+"""
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi.responses import PlainTextResponse
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+# Queries per request
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in values:
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}"
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # Per label set: a count per bucket (last one is +Inf), then the sum
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(labels)
+            if counts is None:
+                counts = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(labels, list(counts)) for labels, counts in self._values.items()]
+        for labels, counts in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                yield f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}"
+
+class Gauge:
+    """Read at scrape time from a callback per label set"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._functions: Dict[Tuple, Callable[[], float]] = {}
+
+    def set_function(self, labels: Tuple, function: Callable[[], float]):
+        self._functions[tuple(labels)] = function
+
+    def samples(self) -> Iterable[str]:
+        for labels, function in list(self._functions.items()):
+            yield f"{self.name}{_format_labels(self.labels, labels)} {_format_value(function())}"
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labels)
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labels, buckets)
+
+    def gauge(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, help, labels)
+
+    def render(self) -> str:
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+def metrics_response(registry: MetricsRegistry = metrics_registry) -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
+
+# ==================== REQUESTS ====================
+
+class RequestStats:
+    __slots__ = ("queries", "query_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+# The current request's DB usage, filled in by instrument_engine's listeners
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+class MetricsMiddleware:
+    """Request count and latency per route template (plus DB usage per request
+    when track_db is set and the engine is instrumented)"""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry, track_db: bool = False):
+        self.app = app
+        self.track_db = track_db
+        self.requests = registry.counter("http_requests_total", "Requests handled", ("method", "route", "status"))
+        self.latency = registry.histogram("http_request_duration_seconds", "Request latency", ("method", "route"))
+        if track_db:
+            self.db_queries = registry.histogram(
+                "http_request_db_queries", "Database queries per request", ("method", "route"), QUERY_COUNT_BUCKETS
+            )
+            self.db_seconds = registry.histogram(
+                "http_request_db_seconds", "Time spent in database queries per request", ("method", "route")
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _request_stats.reset(token)
+            # The matched route's template keeps label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            self.requests.inc(method, path, str(status_code))
+            self.latency.observe(elapsed, method, path)
+            if self.track_db:
+                self.db_queries.observe(stats.queries, method, path)
+                self.db_seconds.observe(stats.query_seconds, method, path)
+
+# ==================== DATABASE ====================
+
+def instrument_engine(engine, name: str, registry: MetricsRegistry = metrics_registry):
+    """Time queries and pool checkouts on a sync Engine (for an AsyncEngine
+    pass its sync_engine), and add query time to the current request's stats"""
+    from sqlalchemy import event
+
+    query_seconds = registry.histogram("db_query_duration_seconds", "Database query latency", ("engine",), QUERY_BUCKETS)
+    pool_wait = registry.histogram("db_pool_wait_seconds", "Time waiting to check a connection out of the pool", ("engine",))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_query_start"].pop()
+        query_seconds.observe(elapsed, name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("metrics_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+    # The pool has no "checkout started" event, so time the call itself
+    pool = engine.pool
+    checkout = pool.connect
+
+    def timed_checkout():
+        started = time.perf_counter()
+        try:
+            return checkout()
+        finally:
+            pool_wait.observe(time.perf_counter() - started, name)
+
+    pool.connect = timed_checkout
+
+    if hasattr(pool, "checkedout"):
+        registry.gauge("db_pool_checked_out", "Connections currently checked out", ("engine",)).set_function(
+            (name,), pool.checkedout
+        )
+        registry.gauge("db_pool_size", "Configured pool size", ("engine",)).set_function((name,), pool.size)
@@ -0,0 +1,138 @@
+"""
+Schema migrations for existing databases.
+create_all() only creates missing tables; indexes and columns added to
+tables that already exist are applied here. Every step is idempotent.
+"""
+from sqlalchemy import func, inspect, text
+from sqlalchemy.orm import Session
+from sqlalchemy.schema import CreateColumn
+
+from database import engine, Base
+import models  # noqa: F401 - register all tables on Base.metadata
+from consumption import rebuild_daily_consumption, billing_columns
+from rollups import rebuild_meal_rollups
+
+def _index_names(conn, table_name: str) -> set:
+    return {index['name'] for index in inspect(conn).get_indexes(table_name)}
+
+def _create_missing_indexes(conn, table, names):
+    existing = _index_names(conn, table.name)
+    for index in table.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(bind=conn)
+
+def _add_missing_columns(conn, table, names):
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    for name in names:
+        if name not in existing:
+            ddl = CreateColumn(table.c[name]).compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+
+def add_billing_history_index(conn):
+    """Composite (created_by, date, created_at) index for paginated history"""
+    _create_missing_indexes(conn, models.BillingRecord.__table__, {
+        "ix_billing_records_created_by_date_created_at",
+    })
+
+def add_billing_report_columns(conn, batch_size: int = 1000):
+    """Denormalized customer/meal columns for SQL-side reports, backfilled from JSON"""
+    table = models.BillingRecord.__table__
+    _add_missing_columns(conn, table, [
+        "customer_id", "customer_name", "company_name",
+        "breakfast_qty", "lunch_qty", "breakfast_exception_qty", "lunch_exception_qty",
+    ])
+    _create_missing_indexes(conn, table, {
+        "ix_billing_records_customer_id_date",
+        "ix_billing_records_company_name_date",
+    })
+
+    # customer_name is always set on new bills, so NULL marks rows still to backfill
+    BillingRecord = models.BillingRecord
+    with Session(bind=conn) as db:
+        while True:
+            bills = db.query(
+                BillingRecord.id,
+                BillingRecord.is_guest,
+                BillingRecord.is_support_staff,
+                BillingRecord.customer,
+                BillingRecord.items
+            ).filter(BillingRecord.customer_name.is_(None)).order_by(BillingRecord.id).limit(batch_size).all()
+            if not bills:
+                break
+            db.bulk_update_mappings(BillingRecord, [
+                {"id": bill.id, **billing_columns(bill.is_guest, bill.is_support_staff, bill.customer, bill.items)}
+                for bill in bills
+            ])
+            db.flush()
+        db.commit()
+
+def add_hrms_sync_columns(conn):
+    """Per-row HRMS payload hash and soft-delete flag for incremental sync"""
+    for model in (models.Employee, models.SupportStaff):
+        _add_missing_columns(conn, model.__table__, ["hrms_hash", "is_active"])
+
+def _backfill_if_empty(conn, model, rebuild):
+    with Session(bind=conn) as db:
+        if db.query(model.id).first() is None and db.query(models.BillingRecord.id).first() is not None:
+            rebuild(db)
+
+def backfill_daily_consumption(conn):
+    """Populate the daily consumption index from existing bills"""
+    _backfill_if_empty(conn, models.DailyConsumption, rebuild_daily_consumption)
+
+def backfill_meal_rollups(conn):
+    """Populate the dashboard meal rollups from existing bills"""
+    _backfill_if_empty(conn, models.MealRollup, rebuild_meal_rollups)
+
+def add_price_versions(conn):
+    """Version column on price_master and the price version stamped on each bill"""
+    PriceMaster = models.PriceMaster
+    _add_missing_columns(conn, PriceMaster.__table__, ["version"])
+    if "ix_price_master_version" not in _index_names(conn, PriceMaster.__tablename__):
+        # Rows were edited in place until now, so number any extras by id before enforcing uniqueness
+        with Session(bind=conn) as db:
+            ids = [row.id for row in db.query(PriceMaster.id).order_by(PriceMaster.id)]
+            db.bulk_update_mappings(PriceMaster, [{"id": id, "version": n} for n, id in enumerate(ids, start=1)])
+            db.commit()
+        _create_missing_indexes(conn, PriceMaster.__table__, {"ix_price_master_version"})
+
+    BillingRecord = models.BillingRecord
+    _add_missing_columns(conn, BillingRecord.__table__, ["price_version"])
+    # Existing bills were always valued at the current prices
+    with Session(bind=conn) as db:
+        current = db.query(func.max(PriceMaster.version)).scalar() or 1
+        db.query(BillingRecord).filter(BillingRecord.price_version.is_(None)).update(
+            {BillingRecord.price_version: current}, synchronize_session=False
+        )
+        db.commit()
+
+def add_client_bill_id(conn):
+    """Client idempotency key on bills, unique so replays can't double-bill"""
+    table = models.BillingRecord.__table__
+    _add_missing_columns(conn, table, ["client_bill_id"])
+    _create_missing_indexes(conn, table, {"ix_billing_records_client_bill_id"})
+
+def add_client_bill_hash(conn):
+    """Hash of the bill each idempotency key was used for; older bills have none"""
+    _add_missing_columns(conn, models.BillingRecord.__table__, ["client_bill_hash"])
+
+MIGRATIONS = [
+    add_billing_history_index,
+    add_billing_report_columns,
+    add_hrms_sync_columns,
+    backfill_daily_consumption,
+    backfill_meal_rollups,
+    add_price_versions,
+    add_client_bill_id,
+    add_client_bill_hash,
+]
+
+def run_migrations(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        for migration in MIGRATIONS:
+            migration(conn)
+
+if __name__ == "__main__":
+    run_migrations()
+    print(f"Applied {len(MIGRATIONS)} migration step(s)")
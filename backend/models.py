@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, Text, JSON, UniqueConstraint, Index
+from sqlalchemy.sql import func, expression
 from database import Base
 
 class User(Base):
@@ -21,6 +21,8 @@ class Employee(Base):
     mobile_number = Column(String(20), nullable=True)
     location = Column(String(255), nullable=True)
     qr_code = Column(Text, nullable=True)
+    hrms_hash = Column(String(40), nullable=True)  # Hash of the last HRMS payload applied to this row
+    is_active = Column(Boolean, nullable=False, default=True, server_default=expression.true())
     created_by = Column(String(50), nullable=False)
     created_date = Column(String(20), nullable=False, default=func.current_date())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -34,6 +36,8 @@ class SupportStaff(Base):
     designation = Column(String(100), nullable=True)
     company_name = Column(String(255), nullable=True)
     biometric_data = Column(Text, nullable=True)
+    hrms_hash = Column(String(40), nullable=True)  # Hash of the last HRMS payload applied to this row
+    is_active = Column(Boolean, nullable=False, default=True, server_default=expression.true())
     created_by = Column(String(50), nullable=False)
     created_date = Column(String(20), nullable=False, default=func.current_date())
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -48,6 +52,12 @@ class Guest(Base):
 
 class BillingRecord(Base):
     __tablename__ = "billing_records"
+    __table_args__ = (
+        Index("ix_billing_records_created_by_date_created_at", "created_by", "date", "created_at"),
+        Index("ix_billing_records_customer_id_date", "customer_id", "date"),
+        Index("ix_billing_records_company_name_date", "company_name", "date"),
+        Index("ix_billing_records_client_bill_id", "client_bill_id", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     date = Column(String(20), nullable=False, index=True)
@@ -59,15 +69,81 @@ class BillingRecord(Base):
     total_items = Column(Integer, nullable=False)
     total_amount = Column(Float, nullable=False)
     pricing_type = Column(String(20), default="employee")
+    # Denormalized from customer/items JSON so reports can filter and aggregate in SQL
+    customer_id = Column(String(50), nullable=True)
+    customer_name = Column(String(255), nullable=True)
+    company_name = Column(String(255), nullable=True)
+    breakfast_qty = Column(Integer, nullable=False, default=0, server_default="0")
+    lunch_qty = Column(Integer, nullable=False, default=0, server_default="0")
+    breakfast_exception_qty = Column(Integer, nullable=False, default=0, server_default="0")
+    lunch_exception_qty = Column(Integer, nullable=False, default=0, server_default="0")
+    # PriceMaster.version in effect when the bill was created
+    price_version = Column(Integer, nullable=True)
+    # Idempotency key generated by the counter, so replayed submissions aren't billed twice
+    client_bill_id = Column(String(64), nullable=True)
+    # idempotency.bill_request_hash of the request that used client_bill_id
+    client_bill_hash = Column(String(40), nullable=True)
     created_by = Column(String(50), nullable=False, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+class DailyConsumption(Base):
+    __tablename__ = "daily_consumption"
+    __table_args__ = (
+        UniqueConstraint("date", "customer_type", "customer_id", name="uq_daily_consumption_customer"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(String(20), nullable=False)
+    customer_type = Column(String(20), nullable=False)  # "employee" or "support_staff"
+    customer_id = Column(String(50), nullable=False)
+    breakfast = Column(Integer, nullable=False, default=0)
+    lunch = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class MealRollup(Base):
+    __tablename__ = "meal_rollups"
+    __table_args__ = (
+        UniqueConstraint("date", "created_by", "company_name", "customer_type", "meal", name="uq_meal_rollups_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(String(20), nullable=False)
+    created_by = Column(String(50), nullable=False)
+    company_name = Column(String(255), nullable=False)
+    customer_type = Column(String(20), nullable=False)  # "employee", "support_staff" or "guest"
+    meal = Column(String(20), nullable=False)  # "breakfast" or "lunch"
+    quantity = Column(Integer, nullable=False, default=0)
+
 class PriceMaster(Base):
+    """Append-only: each update adds a row with the next version"""
     __tablename__ = "price_master"
+    __table_args__ = (
+        Index("ix_price_master_version", "version", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     employee_breakfast = Column(Float, nullable=False, default=20)
     employee_lunch = Column(Float, nullable=False, default=48)
     company_breakfast = Column(Float, nullable=False, default=135)
     company_lunch = Column(Float, nullable=False, default=165)
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+class BackgroundJob(Base):
+    """State of jobs run by jobs.JobQueue, shared by every API worker"""
+    __tablename__ = "background_jobs"
+    __table_args__ = (
+        Index("ix_background_jobs_kind_status", "kind", "status"),
+    )
+    
+    id = Column(String(32), primary_key=True)
+    kind = Column(String(50), nullable=False)
+    status = Column(String(20), nullable=False)  # queued -> running -> completed | failed
+    progress = Column(JSON)
+    result = Column(JSON)
+    error = Column(Text)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    # Refreshed while the owning worker is alive; a stale active job is treated as dead
+    heartbeat_at = Column(DateTime, nullable=False)
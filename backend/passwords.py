@@ -0,0 +1,70 @@
+"""
+Password hashing.
+passlib (and the bcrypt backend behind it) is imported on first use, so
+importing the API doesn't pay for it until someone logs in.
+
+bcrypt is deliberately slow, so request handlers hash and verify on a small
+dedicated thread pool rather than on the event loop. The pool takes at most
+PASSWORD_HASH_MAX_PENDING calls at a time (running plus queued); beyond that
+PasswordWorkersBusy is raised so a login storm is turned away early instead
+of queueing for ever. Hashes made with a different cost than BCRYPT_ROUNDS
+are replaced on the next successful login.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from config import settings
+
+@lru_cache(maxsize=None)
+def password_context():
+    from passlib.context import CryptContext
+    rounds = settings.BCRYPT_ROUNDS
+    # min == max == default, so any other cost reads as needing an update
+    return CryptContext(
+        schemes=["bcrypt"], deprecated="auto",
+        bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds
+    )
+
+def verify_password(plain_password, hashed_password):
+    return password_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """(matches, replacement hash or None if the stored one is current)"""
+    return password_context().verify_and_update(plain_password, hashed_password)
+
+def get_password_hash(password):
+    return password_context().hash(password)
+
+class PasswordWorkersBusy(Exception):
+    pass
+
+class PasswordWorkers:
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, func, *args):
+        # Only touched from the event loop, so a plain counter is enough
+        if self.pending >= self.max_pending:
+            raise PasswordWorkersBusy()
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="passwords")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+password_workers = PasswordWorkers(settings.PASSWORD_HASH_WORKERS, settings.PASSWORD_HASH_MAX_PENDING)
+
+async def verify_and_update_password_async(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    return await password_workers.run(verify_and_update_password, plain_password, hashed_password)
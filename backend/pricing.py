@@ -0,0 +1,118 @@
+"""
+Process-wide price master snapshot.
+Prices change a few times a year, so the full version history is kept in
+memory and reloaded only after an update (or after a short max age, so
+updates made through another worker are picked up).
+"""
+import asyncio
+import time
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import PriceMaster
+
+PRICE_CACHE_MAX_AGE_SECONDS = 60
+
+DEFAULT_PRICES = {
+    "employee_breakfast": 20,
+    "employee_lunch": 48,
+    "company_breakfast": 135,
+    "company_lunch": 165
+}
+
+class PriceSnapshot(NamedTuple):
+    id: Optional[int]
+    version: int
+    employee_breakfast: float
+    employee_lunch: float
+    company_breakfast: float
+    company_lunch: float
+
+    @classmethod
+    def from_row(cls, row: PriceMaster) -> "PriceSnapshot":
+        return cls(
+            row.id,
+            row.version,
+            row.employee_breakfast,
+            row.employee_lunch,
+            row.company_breakfast,
+            row.company_lunch
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "version": self.version,
+            "employee_breakfast": self.employee_breakfast,
+            "employee_lunch": self.employee_lunch,
+            "company_breakfast": self.company_breakfast,
+            "company_lunch": self.company_lunch
+        }
+
+class PriceTable:
+    """Every price version, keyed by version number"""
+
+    def __init__(self, versions: Dict[int, PriceSnapshot]):
+        self.versions = versions
+        self.current = versions[max(versions)]
+
+    def company_price(self, version_column, meal: str):
+        """SQL expression for the company price of a meal at each bill's price version"""
+        column = f"company_{meal}"
+        return case(
+            {version: getattr(snapshot, column) for version, snapshot in self.versions.items()},
+            value=version_column,
+            else_=getattr(self.current, column)
+        )
+
+async def add_price_version(db: AsyncSession, prices: dict) -> PriceMaster:
+    """Append a new price version (caller commits)"""
+    result = await db.execute(select(func.max(PriceMaster.version)))
+    row = PriceMaster(version=(result.scalar() or 0) + 1, **prices)
+    db.add(row)
+    await db.flush()
+    return row
+
+class PriceCache:
+    def __init__(self, max_age: float = PRICE_CACHE_MAX_AGE_SECONDS):
+        self.max_age = max_age
+        self._table: Optional[PriceTable] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        self._generation += 1
+        self._table = None
+
+    def _fresh(self) -> Optional[PriceTable]:
+        table = self._table
+        if table is not None and time.monotonic() - self._loaded_at < self.max_age:
+            return table
+        return None
+
+    async def get(self, db: AsyncSession) -> PriceTable:
+        """Cached price table, loaded through the caller's session on a miss"""
+        table = self._fresh()
+        if table is not None:
+            return table
+        async with self._lock:
+            table = self._fresh()
+            if table is None:
+                generation = self._generation
+                result = await db.execute(select(PriceMaster))
+                versions = {row.version: PriceSnapshot.from_row(row) for row in result.scalars()}
+                # bootstrap.py creates the first row; until then bills are priced at the defaults
+                table = PriceTable(versions or {1: PriceSnapshot(None, 1, **DEFAULT_PRICES)})
+                # Don't publish prices that an update has already superseded
+                if generation == self._generation:
+                    self._table = table
+                    self._loaded_at = time.monotonic()
+            return table
+
+    async def current(self, db: AsyncSession) -> PriceSnapshot:
+        return (await self.get(db)).current
+
+price_cache = PriceCache()
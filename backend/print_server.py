@@ -2,15 +2,17 @@
 Thermal Printer Server for Rugtek RP326
 Handles ESC/POS printing via USB or Network
 """
-import usb.core
-import usb.util
-import socket
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List
+import asyncio
 import logging
 
+from escpos import DEFAULT_PAPER_WIDTH, receipt_template
+from metrics import MetricsMiddleware, metrics_registry, metrics_response
+from printer_registry import PrinterRegistry, RegisteredPrinter
+
 app = FastAPI(title="Thermal Printer Service")
 
 # CORS for local frontend
@@ -21,37 +23,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# ESC/POS Commands
-ESC = b'\x1b'
-GS = b'\x1d'
-
-class ESCPOSCommands:
-    """ESC/POS command constants for thermal printer"""
-    INIT = ESC + b'@'                    # Initialize printer
-    ALIGN_CENTER = ESC + b'a' + b'\x01'  # Center alignment
-    ALIGN_LEFT = ESC + b'a' + b'\x00'    # Left alignment
-    BOLD_ON = ESC + b'E' + b'\x01'       # Bold text on
-    BOLD_OFF = ESC + b'E' + b'\x00'      # Bold text off
-    DOUBLE_HEIGHT = ESC + b'!' + b'\x10' # Double height text
-    DOUBLE_WIDTH = ESC + b'!' + b'\x20'  # Double width text
-    NORMAL = ESC + b'!' + b'\x00'        # Normal text
-    CUT_PAPER = GS + b'V' + b'\x00'      # Full cut
-    FEED_LINE = b'\n'                    # Line feed
-    
-class PrinterConfig:
-    """Printer configuration"""
-    # USB Vendor and Product IDs for Rugtek RP326
-    USB_VENDOR_ID = 0x0fe6   # Rugtek vendor ID (may vary)
-    USB_PRODUCT_ID = 0x811e  # RP326 product ID (may vary)
-    
-    # Network config (if using network printer)
-    NETWORK_IP = "192.168.1.100"  # Change to your printer's IP
-    NETWORK_PORT = 9100
-
 class ReceiptData(BaseModel):
     billNumber: str
     customerName: str
@@ -61,203 +37,64 @@ class ReceiptData(BaseModel):
     time: str
     items: List[dict]
     location: Optional[str] = "Refex Nungambakkam"
+    # Send to a named printer instead of routing by location/items
+    printer: Optional[str] = None
 
-class PrinterConnection:
-    """Handles connection to thermal printer"""
-    
-    def __init__(self):
-        self.usb_device = None
-        self.network_socket = None
-        self.connection_type = None
-        
-    def connect_usb(self):
-        """Connect to USB printer"""
-        try:
-            # Find the USB device
-            device = usb.core.find(
-                idVendor=PrinterConfig.USB_VENDOR_ID,
-                idProduct=PrinterConfig.USB_PRODUCT_ID
-            )
-            
-            if device is None:
-                # Try to find any thermal printer
-                device = usb.core.find(custom_match=lambda d: 
-                    d.bDeviceClass == 7 or  # Printer class
-                    (d.idVendor == 0x0fe6)  # Rugtek vendor
-                )
-            
-            if device is None:
-                logger.error("USB printer not found")
-                return False
-            
-            # Detach kernel driver if active
-            if device.is_kernel_driver_active(0):
-                try:
-                    device.detach_kernel_driver(0)
-                except Exception as e:
-                    logger.warning(f"Could not detach kernel driver: {e}")
-            
-            # Set configuration
-            device.set_configuration()
-            
-            # Get endpoint
-            cfg = device.get_active_configuration()
-            intf = cfg[(0, 0)]
-            
-            self.usb_device = device
-            self.connection_type = "USB"
-            logger.info("Connected to USB printer successfully")
-            return True
-            
-        except Exception as e:
-            logger.error(f"USB connection failed: {e}")
-            return False
-    
-    def connect_network(self, ip: str = None, port: int = 9100):
-        """Connect to network printer"""
-        try:
-            ip = ip or PrinterConfig.NETWORK_IP
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(5)
-            sock.connect((ip, port))
-            
-            self.network_socket = sock
-            self.connection_type = "Network"
-            logger.info(f"Connected to network printer at {ip}:{port}")
-            return True
-            
-        except Exception as e:
-            logger.error(f"Network connection failed: {e}")
-            return False
-    
-    def send(self, data: bytes):
-        """Send data to printer"""
-        try:
-            if self.connection_type == "USB" and self.usb_device:
-                # Find OUT endpoint
-                cfg = self.usb_device.get_active_configuration()
-                intf = cfg[(0, 0)]
-                ep = usb.util.find_descriptor(
-                    intf,
-                    custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT
-                )
-                
-                if ep:
-                    ep.write(data)
-                    return True
-                    
-            elif self.connection_type == "Network" and self.network_socket:
-                self.network_socket.sendall(data)
-                return True
-                
-            return False
-            
-        except Exception as e:
-            logger.error(f"Send failed: {e}")
-            return False
-    
-    def disconnect(self):
-        """Disconnect from printer"""
-        if self.network_socket:
-            self.network_socket.close()
-        self.usb_device = None
-        self.network_socket = None
-        self.connection_type = None
+class ReceiptBatch(BaseModel):
+    receipts: List[ReceiptData] = Field(..., min_length=1, max_length=200)
+
+# How long /api/print/batch?wait=true waits for the printers
+BATCH_WAIT_SECONDS = 30
+
+# Named printers, each with its own connection, health monitor and spool;
+# only a printer's spool worker writes to it
+registry = PrinterRegistry.load()
 
-# Global printer connection
-printer = PrinterConnection()
+queue_depth = metrics_registry.gauge("print_queue_depth", "Jobs waiting or being printed", ("printer",))
+printer_connected = metrics_registry.gauge("printer_connected", "1 if the printer is connected", ("printer",))
+for printer in registry.printers.values():
+    queue_depth.set_function((printer.name,), lambda spool=printer.spool: spool.depth)
+    printer_connected.set_function((printer.name,), lambda connection=printer.connection: int(connection.connected))
 
-def format_receipt(data: ReceiptData) -> bytes:
+def select_printer(location: Optional[str], items: List[dict], name: Optional[str] = None) -> RegisteredPrinter:
+    """Route a ticket to its printer. An offline printer still takes the job;
+    its spool holds it until the printer reconnects."""
+    if name:
+        target = registry.printers.get(name)
+        if not target:
+            raise HTTPException(status_code=404, detail=f"Unknown printer: {name}")
+        return target
+    return registry.route(location, items)
+
+def format_receipt(data: ReceiptData, width: int = DEFAULT_PAPER_WIDTH) -> bytearray:
     """Format receipt data into ESC/POS commands"""
-    cmd = ESCPOSCommands
-    receipt = b''
-    
-    # Initialize printer
-    receipt += cmd.INIT
-    
-    # Header - Center aligned, bold
-    receipt += cmd.ALIGN_CENTER + cmd.BOLD_ON
-    receipt += b'KITCHEN PRINT' + cmd.FEED_LINE
-    receipt += data.location.encode('utf-8') + cmd.FEED_LINE
-    receipt += cmd.DOUBLE_HEIGHT
-    receipt += f'***Bill No. - {data.billNumber}***'.encode('utf-8') + cmd.FEED_LINE
-    receipt += cmd.NORMAL + cmd.BOLD_OFF
-    
-    # Separator
-    receipt += b'================================' + cmd.FEED_LINE
-    
-    # Customer info - Left aligned
-    receipt += cmd.ALIGN_LEFT
-    receipt += f'Customer: {data.customerName}'.encode('utf-8') + cmd.FEED_LINE
-    receipt += f'ID: {data.customerId}'.encode('utf-8') + cmd.FEED_LINE
-    receipt += f'Created by: {data.createdBy}'.encode('utf-8') + cmd.FEED_LINE
-    receipt += f'DATE: {data.date}  TIME: {data.time}'.encode('utf-8') + cmd.FEED_LINE
-    
-    # Separator
-    receipt += b'================================' + cmd.FEED_LINE
-    
-    # Items header - Bold
-    receipt += cmd.BOLD_ON
-    receipt += b'Item Name              QTY' + cmd.FEED_LINE
-    receipt += b'--------------------------------' + cmd.FEED_LINE
-    receipt += cmd.BOLD_OFF
-    
-    # Items
-    for item in data.items:
-        name = item['name'].upper()[:22].ljust(22)
-        qty = str(item['quantity']).rjust(4)
-        receipt += f'{name} {qty}'.encode('utf-8') + cmd.FEED_LINE
-    
-    # Separator
-    receipt += b'================================' + cmd.FEED_LINE
-    receipt += cmd.FEED_LINE
-    
-    # Footer - Center aligned
-    receipt += cmd.ALIGN_CENTER
-    receipt += cmd.BOLD_ON
-    receipt += b'Thank you!' + cmd.FEED_LINE
-    receipt += cmd.BOLD_OFF
-    receipt += b'Powered by Refex POS System' + cmd.FEED_LINE
-    receipt += cmd.FEED_LINE + cmd.FEED_LINE + cmd.FEED_LINE
-    
-    # Cut paper
-    receipt += cmd.CUT_PAPER
-    
-    return receipt
+    return receipt_template(width).render(data)
 
 @app.post("/api/print/receipt")
 async def print_receipt(data: ReceiptData):
     """Print receipt to thermal printer"""
     try:
-        # Try to connect if not connected
-        if not printer.connection_type:
-            # Try USB first
-            if not printer.connect_usb():
-                # Try network as fallback
-                if not printer.connect_network():
-                    raise HTTPException(
-                        status_code=503,
-                        detail="Printer not connected. Please check USB/Network connection."
-                    )
+        target = select_printer(data.location, data.items, data.printer)
         
         # Format receipt
-        receipt_data = format_receipt(data)
+        receipt_data = format_receipt(data, target.connection.config.PAPER_WIDTH)
         
-        # Send to printer
-        if printer.send(receipt_data):
-            logger.info(f"Receipt printed successfully: Bill #{data.billNumber}")
-            return {
-                "success": True,
-                "message": "Receipt printed successfully",
-                "billNumber": data.billNumber,
-                "connectionType": printer.connection_type
-            }
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to send data to printer"
-            )
+        # Queue for the printer; the spool worker sends and retries
+        job = await target.spool.submit(receipt_data)
+        logger.info(f"Receipt queued on {target.name}: Bill #{data.billNumber} (job {job.id})")
+        return {
+            "success": True,
+            "message": "Receipt queued for printing",
+            "billNumber": data.billNumber,
+            "printer": target.name,
+            "connectionType": target.connection.connection_type,
+            "printerConnected": target.connection.connected,
+            "jobId": job.id,
+            "status": job.status
+        }
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Print failed: {e}")
         raise HTTPException(
@@ -265,37 +102,85 @@ async def print_receipt(data: ReceiptData):
             detail=f"Print failed: {str(e)}"
         )
 
+@app.post("/api/print/batch")
+async def print_batch(batch: ReceiptBatch, wait: bool = False):
+    """Print several receipts with one coalesced write per printer.
+    Tickets (each ending in a cut) are rendered back to back into a single
+    buffer per printer; per-ticket status is reported, after the writes
+    finish when wait=true."""
+    results = [None] * len(batch.receipts)
+    buffers = {}
+    for index, data in enumerate(batch.receipts):
+        try:
+            target = select_printer(data.location, data.items, data.printer)
+        except HTTPException as e:
+            results[index] = {
+                "billNumber": data.billNumber,
+                "printer": data.printer,
+                "jobId": None,
+                "status": "error",
+                "detail": e.detail
+            }
+            continue
+        _, buf, indexes, ends = buffers.setdefault(target.name, (target, bytearray(), [], []))
+        receipt_template(target.connection.config.PAPER_WIDTH).render_into(buf, data)
+        indexes.append(index)
+        ends.append(len(buf))
+    
+    jobs = []
+    for target, buf, indexes, ends in buffers.values():
+        tickets = [batch.receipts[i].billNumber for i in indexes]
+        jobs.append((await target.spool.submit(buf, kind="batch", tickets=tickets, ends=ends), indexes))
+    logger.info(f"Batch of {len(batch.receipts)} receipt(s) queued as {len(jobs)} job(s)")
+    
+    if wait and jobs:
+        try:
+            await asyncio.wait_for(asyncio.gather(*(job.done.wait() for job, _ in jobs)), BATCH_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    
+    for job, indexes in jobs:
+        for position, index in enumerate(indexes):
+            status = job.ticket_status(position)
+            results[index] = {
+                "billNumber": job.tickets[position],
+                "printer": job.printer,
+                "jobId": job.id,
+                "status": status,
+                "detail": job.error if status == "failed" else None
+            }
+    return {
+        "success": all(result["status"] != "error" for result in results),
+        "jobs": len(jobs),
+        "results": results
+    }
+
 @app.get("/api/print/status")
 async def printer_status():
-    """Check printer connection status"""
-    if printer.connection_type:
-        return {
-            "connected": True,
-            "connectionType": printer.connection_type,
-            "status": "ready"
-        }
-    else:
-        # Try to connect
-        if printer.connect_usb() or printer.connect_network():
-            return {
-                "connected": True,
-                "connectionType": printer.connection_type,
-                "status": "ready"
-            }
-        return {
-            "connected": False,
-            "connectionType": None,
-            "status": "disconnected"
-        }
+    """Check printer connection status (cached by the background probes)"""
+    printers = registry.status()
+    primary = registry.primary.connection
+    return {
+        "connected": any(p["connected"] for p in printers),
+        "connectionType": primary.connection_type,
+        "status": "ready" if any(p["connected"] for p in printers) else "disconnected",
+        "queued": sum(p["queued"] for p in printers),
+        "printers": printers
+    }
+
+@app.get("/api/print/jobs/{job_id}")
+async def print_job_status(job_id: str):
+    """Status of a queued print job"""
+    job = registry.find_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Print job not found")
+    return job.to_dict()
 
 @app.post("/api/print/test")
-async def test_print():
-    """Print test receipt"""
+async def test_print(printer: Optional[str] = None):
+    """Print test receipt (on the default group, or a named printer)"""
     try:
-        if not printer.connection_type:
-            if not printer.connect_usb():
-                if not printer.connect_network():
-                    raise HTTPException(status_code=503, detail="Printer not connected")
+        target = select_printer(None, [], printer)
         
         test_data = ReceiptData(
             billNumber="TEST-001",
@@ -310,20 +195,30 @@ async def test_print():
             ]
         )
         
-        receipt_data = format_receipt(test_data)
+        receipt_data = format_receipt(test_data, target.connection.config.PAPER_WIDTH)
         
-        if printer.send(receipt_data):
-            return {"success": True, "message": "Test print successful"}
-        else:
-            raise HTTPException(status_code=500, detail="Failed to print test receipt")
+        job = await target.spool.submit(receipt_data, kind="test")
+        return {"success": True, "message": "Test print queued", "printer": target.name, "jobId": job.id, "status": job.status}
             
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape target"""
+    return metrics_response()
+
+@app.on_event("startup")
+async def startup_event():
+    """Start probing so the first print finds a warm connection"""
+    registry.start()
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup on shutdown"""
-    printer.disconnect()
+    await registry.stop()
 
 if __name__ == "__main__":
     import uvicorn
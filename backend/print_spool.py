@@ -0,0 +1,258 @@
+"""
+In-process print spool.
+Jobs are queued and handed to a single worker per printer, so requests return
+a job id at once and tickets never interleave on the wire. Jobs for an offline
+printer wait for its monitor to reconnect it, failed sends are retried, and with
+a journal directory configured, queued tickets survive a restart.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from printer_connection import PrinterConnection, PrinterMonitor
+
+logger = logging.getLogger(__name__)
+
+class SpoolConfig:
+    """Spool configuration"""
+    # Unset disables the journal; queued tickets are then lost on restart
+    JOURNAL_DIR = os.environ.get("PRINT_SPOOL_DIR") or None
+    MAX_ATTEMPTS = int(os.environ.get("PRINT_SPOOL_MAX_ATTEMPTS", "3"))
+    RETRY_DELAY_SECONDS = float(os.environ.get("PRINT_SPOOL_RETRY_DELAY", "2"))
+    # How long after submission a job may wait for an unreachable printer before it is failed
+    OFFLINE_TIMEOUT_SECONDS = float(os.environ.get("PRINT_SPOOL_OFFLINE_TIMEOUT", "600"))
+    # Finished jobs kept around for status lookups
+    HISTORY_SIZE = 500
+
+class PrintJob:
+    """Bytes for one printer. A batch job holds several tickets back to back;
+    ends[i] is the offset just past ticket i."""
+
+    def __init__(self, data: bytes, kind: str = "receipt", job_id: str = None, created_at: float = None,
+                 tickets: Optional[List[str]] = None, ends: Optional[List[int]] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.data = data
+        self.tickets = tickets
+        self.ends = ends or [len(data)]
+        # Bytes the printer has accepted; retries resume from the first unfinished ticket
+        self.sent = 0
+        self.done = asyncio.Event()
+        self.printer = None
+        self.status = "queued"
+        self.attempts = 0
+        self.error = None
+        self.created_at = created_at or time.time()
+        self.finished_at = None
+
+    def ticket_status(self, index: int) -> str:
+        if self.ends[index] <= self.sent:
+            return "printed"
+        if self.status == "printing" and index > 0 and self.ends[index - 1] > self.sent:
+            # An earlier ticket in the batch is still going out
+            return "queued"
+        return self.status
+
+    def to_dict(self) -> dict:
+        result = {
+            "jobId": self.id,
+            "kind": self.kind,
+            "printer": self.printer,
+            "status": self.status,
+            "attempts": self.attempts,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "finishedAt": self.finished_at
+        }
+        if self.tickets:
+            result["tickets"] = [
+                {"billNumber": ticket, "status": self.ticket_status(i)}
+                for i, ticket in enumerate(self.tickets)
+            ]
+        return result
+
+class SpoolJournal:
+    """One file per queued job; written atomically, removed once the job finishes"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job: PrintJob) -> str:
+        # Creation time first so a directory listing replays in submission order
+        return os.path.join(self.directory, f"{int(job.created_at * 1e6):020d}-{job.id}.job")
+
+    def add(self, job: PrintJob):
+        path = self._path(job)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({
+                "id": job.id,
+                "kind": job.kind,
+                "createdAt": job.created_at,
+                "tickets": job.tickets,
+                "ends": job.ends,
+                "data": base64.b64encode(job.data).decode("ascii")
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def remove(self, job: PrintJob):
+        try:
+            os.remove(self._path(job))
+        except FileNotFoundError:
+            pass
+
+    def load(self) -> list:
+        jobs = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".job"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                with open(path) as f:
+                    entry = json.load(f)
+                jobs.append(PrintJob(
+                    base64.b64decode(entry["data"]),
+                    kind=entry["kind"],
+                    job_id=entry["id"],
+                    created_at=entry["createdAt"],
+                    tickets=entry.get("tickets"),
+                    ends=entry.get("ends")
+                ))
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Skipping unreadable spool entry {name}: {e}")
+        return jobs
+
+class PrintSpool:
+    """Serializes print jobs for one printer"""
+
+    def __init__(self, printer: PrinterConnection, journal_dir: Optional[str] = SpoolConfig.JOURNAL_DIR,
+                 max_attempts: int = SpoolConfig.MAX_ATTEMPTS,
+                 retry_delay: float = SpoolConfig.RETRY_DELAY_SECONDS,
+                 offline_timeout: float = SpoolConfig.OFFLINE_TIMEOUT_SECONDS,
+                 monitor: Optional[PrinterMonitor] = None):
+        self.printer = printer
+        self.monitor = monitor
+        self.journal = SpoolJournal(journal_dir) if journal_dir else None
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.offline_timeout = offline_timeout
+        self.jobs: "OrderedDict[str, PrintJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._current: Optional[PrintJob] = None
+
+    @property
+    def depth(self) -> int:
+        """Jobs waiting or being printed"""
+        queued = self._queue.qsize() if self._queue is not None else 0
+        return queued + (1 if self._current is not None else 0)
+
+    def start(self):
+        """Start the worker, replaying any journaled jobs left from the last run"""
+        if self._task is not None and not self._task.done():
+            return
+        self._queue = asyncio.Queue()
+        if self.journal:
+            for job in self.journal.load():
+                self._track(job)
+                self._queue.put_nowait(job)
+            if self._queue.qsize():
+                logger.info(f"Recovered {self._queue.qsize()} queued print job(s) from the journal")
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def submit(self, data: bytes, kind: str = "receipt", tickets: Optional[List[str]] = None,
+                     ends: Optional[List[int]] = None) -> PrintJob:
+        job = PrintJob(data, kind, tickets=tickets, ends=ends)
+        if self.journal:
+            # The fsync can take a while on an SD card; keep it off the event loop
+            await run_in_threadpool(self.journal.add, job)
+        self._track(job)
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[PrintJob]:
+        return self.jobs.get(job_id)
+
+    def _track(self, job: PrintJob):
+        job.printer = self.printer.name
+        self.jobs[job.id] = job
+        # Forget the oldest finished jobs; queued ones stay visible
+        while len(self.jobs) > SpoolConfig.HISTORY_SIZE:
+            oldest = next(iter(self.jobs.values()))
+            if oldest.status not in ("printed", "failed"):
+                break
+            self.jobs.popitem(last=False)
+
+    async def _run(self):
+        while True:
+            job = await self._queue.get()
+            self._current = job
+            try:
+                await self._print(job)
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Print job {job.id} failed: {e}")
+            finally:
+                if job.status in ("printed", "failed"):
+                    job.finished_at = time.time()
+                    job.done.set()
+                    if self.journal:
+                        await run_in_threadpool(self.journal.remove, job)
+                self._current = None
+                self._queue.task_done()
+
+    async def _wait_online(self, timeout: float) -> bool:
+        if self.monitor is not None:
+            return await self.monitor.wait_online(timeout)
+        # No monitor: probe ourselves, which still honours the connection's reconnect backoff
+        deadline = time.monotonic() + timeout
+        while True:
+            await run_in_threadpool(self.printer.probe)
+            remaining = deadline - time.monotonic()
+            if self.printer.connected or remaining <= 0:
+                return self.printer.connected
+            await asyncio.sleep(min(self.retry_delay, remaining))
+
+    async def _print(self, job: PrintJob):
+        while job.attempts < self.max_attempts:
+            if not self.printer.connected:
+                # An unreachable printer doesn't use up attempts; keep the job queued until it's back
+                job.status = "queued"
+                job.error = self.printer.last_error
+                # Measured from submission, so a backlog behind an outage isn't granted it again per job
+                remaining = self.offline_timeout - (time.time() - job.created_at)
+                if remaining <= 0 or not await self._wait_online(remaining):
+                    job.error = job.error or "Printer offline"
+                    break
+                continue
+            job.status = "printing"
+            job.attempts += 1
+            job.sent += await run_in_threadpool(self.printer.write, memoryview(job.data)[job.sent:])
+            if job.sent >= len(job.data):
+                job.status = "printed"
+                job.error = None
+                return
+            # Reprint a partly written ticket whole rather than resume mid-ticket
+            job.sent = max([0] + [end for end in job.ends if end <= job.sent])
+            job.error = self.printer.last_error
+            if job.attempts < self.max_attempts:
+                await asyncio.sleep(self.retry_delay * job.attempts)
+        job.status = "failed"
+        logger.error(f"Print job {job.id} failed after {job.attempts} attempt(s): {job.error}")
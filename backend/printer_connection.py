@@ -0,0 +1,349 @@
+"""
+Persistent printer connection with background health probing.
+The USB OUT endpoint is resolved once per connection and the network socket
+is kept open with TCP keepalive. A background task probes the link and
+reconnects with exponential backoff, so status checks never touch the device.
+"""
+import asyncio
+import logging
+import os
+import socket
+import threading
+import time
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+
+from metrics import metrics_registry
+
+try:
+    import usb.core
+    import usb.util
+except ImportError:  # network-only installs
+    usb = None
+
+logger = logging.getLogger(__name__)
+
+write_latency = metrics_registry.histogram("printer_write_duration_seconds", "Time to write one job's bytes to a printer", ("printer",))
+write_bytes = metrics_registry.counter("printer_write_bytes_total", "Bytes written to a printer", ("printer",))
+
+class PrinterConfig:
+    """Printer configuration"""
+    # USB Vendor and Product IDs for Rugtek RP326
+    USB_VENDOR_ID = 0x0fe6   # Rugtek vendor ID (may vary)
+    USB_PRODUCT_ID = 0x811e  # RP326 product ID (may vary)
+    # Optional, to tell identical USB printers apart: serial number string, or bus + address
+    USB_SERIAL = None
+    USB_BUS = None
+    USB_ADDRESS = None
+
+    # Network config (if using network printer)
+    NETWORK_IP = os.environ.get("PRINTER_NETWORK_IP", "192.168.1.100")  # Change to your printer's IP
+    NETWORK_PORT = int(os.environ.get("PRINTER_NETWORK_PORT", "9100"))
+    NETWORK_TIMEOUT = 5
+
+    # Largest single write; USB writes are rounded down to whole packets
+    MAX_WRITE_BYTES = 16384
+
+    # Characters per line: 32 for 58mm paper, 48 for 80mm
+    PAPER_WIDTH = int(os.environ.get("PRINTER_PAPER_WIDTH", "32"))
+
+    # "auto" tries USB first and falls back to network
+    CONNECTION = os.environ.get("PRINTER_CONNECTION", "auto")
+
+    # Health probing and reconnect backoff
+    PROBE_INTERVAL_SECONDS = float(os.environ.get("PRINTER_PROBE_INTERVAL", "5"))
+    RECONNECT_BACKOFF_MAX_SECONDS = 60
+
+    def __init__(self, **overrides):
+        """Per-printer settings; anything not overridden falls back to the defaults above"""
+        for key, value in overrides.items():
+            setattr(self, key.upper(), value)
+
+def _enable_keepalive(sock: socket.socket, idle: int = 30, interval: int = 10, count: int = 3):
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, idle)
+    elif hasattr(socket, "TCP_KEEPALIVE"):  # macOS
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPALIVE, idle)
+    if hasattr(socket, "TCP_KEEPINTVL"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, interval)
+    if hasattr(socket, "TCP_KEEPCNT"):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, count)
+
+class PrinterConnection:
+    """Handles connection to thermal printer.
+
+    Blocking I/O happens in connect()/send()/probe(); async code should call
+    them through a worker thread. status() only reads cached state.
+    """
+
+    def __init__(self, config=PrinterConfig, name: str = "default"):
+        self.config = config
+        self.name = name
+        self.usb_device = None
+        self.usb_endpoint = None
+        self.network_socket = None
+        self.connection_type = None
+        self.last_error = None
+        self.last_checked = None
+        self.failures = 0
+        self.next_attempt_at = 0.0
+        # One writer at a time; probes and reconnects share the same handles
+        self._lock = threading.RLock()
+
+    @property
+    def connected(self) -> bool:
+        return self.connection_type is not None
+
+    def _usb_selected(self, device) -> bool:
+        """Whether a device matches the configured serial / bus / address selectors"""
+        if self.config.USB_BUS is not None and device.bus != self.config.USB_BUS:
+            return False
+        if self.config.USB_ADDRESS is not None and device.address != self.config.USB_ADDRESS:
+            return False
+        if self.config.USB_SERIAL is not None:
+            try:
+                return usb.util.get_string(device, device.iSerialNumber) == self.config.USB_SERIAL
+            except Exception:
+                # No serial descriptor, or no permission to read it
+                return False
+        return True
+
+    def connect_usb(self) -> bool:
+        """Connect to USB printer and cache its OUT endpoint"""
+        if usb is None:
+            return False
+        try:
+            selectors = (self.config.USB_SERIAL, self.config.USB_BUS, self.config.USB_ADDRESS)
+            pinned = any(selector is not None for selector in selectors)
+
+            # Find the USB device
+            device = usb.core.find(
+                idVendor=self.config.USB_VENDOR_ID,
+                idProduct=self.config.USB_PRODUCT_ID,
+                custom_match=self._usb_selected
+            )
+
+            # A pinned printer never falls back to whichever printer is plugged in
+            if device is None and not pinned:
+                # Try to find any thermal printer
+                device = usb.core.find(custom_match=lambda d:
+                    d.bDeviceClass == 7 or  # Printer class
+                    (d.idVendor == 0x0fe6)  # Rugtek vendor
+                )
+
+            if device is None:
+                self.last_error = "USB printer not found"
+                return False
+
+            # Detach kernel driver if active
+            if device.is_kernel_driver_active(0):
+                try:
+                    device.detach_kernel_driver(0)
+                except Exception as e:
+                    logger.warning(f"Could not detach kernel driver: {e}")
+
+            # Set configuration
+            device.set_configuration()
+
+            # Resolve the OUT endpoint once; send() writes to it directly
+            cfg = device.get_active_configuration()
+            intf = cfg[(0, 0)]
+            endpoint = usb.util.find_descriptor(
+                intf,
+                custom_match=lambda e: usb.util.endpoint_direction(e.bEndpointAddress) == usb.util.ENDPOINT_OUT
+            )
+            if endpoint is None:
+                self.last_error = "USB printer has no OUT endpoint"
+                return False
+
+            self.usb_device = device
+            self.usb_endpoint = endpoint
+            self.connection_type = "USB"
+            logger.info("Connected to USB printer successfully")
+            return True
+
+        except Exception as e:
+            self.last_error = f"USB connection failed: {e}"
+            return False
+
+    def connect_network(self, ip: str = None, port: int = None) -> bool:
+        """Connect to network printer and keep the socket alive"""
+        ip = ip or self.config.NETWORK_IP
+        port = port or self.config.NETWORK_PORT
+        try:
+            sock = socket.create_connection((ip, port), timeout=self.config.NETWORK_TIMEOUT)
+            _enable_keepalive(sock)
+
+            self.network_socket = sock
+            self.connection_type = "Network"
+            logger.info(f"Connected to network printer at {ip}:{port}")
+            return True
+
+        except OSError as e:
+            self.last_error = f"Network connection failed: {e}"
+            return False
+
+    def connect(self) -> bool:
+        """Open a connection using the configured transport(s)"""
+        with self._lock:
+            if self.connected:
+                return True
+            mode = self.config.CONNECTION
+            ok = (mode in ("auto", "usb") and self.connect_usb()) or \
+                 (mode in ("auto", "network") and self.connect_network())
+            self.last_checked = time.time()
+            if ok:
+                self.failures = 0
+                self.next_attempt_at = 0.0
+                self.last_error = None
+            else:
+                # Back off 1s, 2s, 4s ... up to the cap between automatic attempts
+                self.failures += 1
+                delay = min(2 ** (self.failures - 1), self.config.RECONNECT_BACKOFF_MAX_SECONDS)
+                self.next_attempt_at = time.monotonic() + delay
+                logger.error(f"Printer {self.name} unavailable ({self.last_error}); next attempt in {delay}s")
+            return ok
+
+    def write_size(self) -> int:
+        if self.connection_type == "USB":
+            packet = self.usb_endpoint.wMaxPacketSize
+            return max(packet, self.config.MAX_WRITE_BYTES // packet * packet)
+        return self.config.MAX_WRITE_BYTES
+
+    def write(self, data) -> int:
+        """Write data in as few large chunks as possible; returns bytes written.
+        Drops the connection on failure."""
+        with self._lock:
+            view = memoryview(data)
+            written = 0
+            started = time.perf_counter()
+            try:
+                size = self.write_size()
+                while written < len(view):
+                    chunk = view[written:written + size]
+                    if self.connection_type == "USB":
+                        written += self.usb_endpoint.write(chunk)
+                    elif self.connection_type == "Network":
+                        self.network_socket.sendall(chunk)
+                        written += len(chunk)
+                    else:
+                        break
+            except Exception as e:
+                self.last_error = f"Send failed: {e}"
+                logger.error(self.last_error)
+                self._drop()
+            write_latency.observe(time.perf_counter() - started, self.name)
+            write_bytes.inc(self.name, amount=written)
+            return written
+
+    def send(self, data: bytes) -> bool:
+        """Send data to printer; drops the connection on failure"""
+        return len(data) > 0 and self.write(data) == len(data)
+
+    def probe(self):
+        """Check the current link, or reconnect once the backoff has elapsed"""
+        with self._lock:
+            if self.connected and not self._alive():
+                logger.warning(f"{self.connection_type} printer {self.name} link lost")
+                self._drop()
+            self.last_checked = time.time()
+            if not self.connected and time.monotonic() >= self.next_attempt_at:
+                self.connect()
+
+    def _alive(self) -> bool:
+        try:
+            if self.connection_type == "Network":
+                # A closed peer reads as EOF; an idle healthy socket has nothing to read
+                self.network_socket.setblocking(False)
+                try:
+                    return self.network_socket.recv(1, socket.MSG_PEEK) != b""
+                except BlockingIOError:
+                    return True
+                finally:
+                    self.network_socket.settimeout(self.config.NETWORK_TIMEOUT)
+            if self.connection_type == "USB":
+                # Raises if the device was unplugged
+                self.usb_device.get_active_configuration()
+                return True
+        except Exception as e:
+            self.last_error = f"Health check failed: {e}"
+        return False
+
+    def _drop(self):
+        if self.network_socket:
+            try:
+                self.network_socket.close()
+            except OSError:
+                pass
+        if self.usb_device is not None and usb is not None:
+            try:
+                usb.util.dispose_resources(self.usb_device)
+            except Exception:
+                pass
+        self.usb_device = None
+        self.usb_endpoint = None
+        self.network_socket = None
+        self.connection_type = None
+
+    def disconnect(self):
+        """Disconnect from printer"""
+        with self._lock:
+            self._drop()
+
+    def status(self) -> dict:
+        """Cached connection state, never blocks on the device"""
+        return {
+            "name": self.name,
+            "connected": self.connected,
+            "connectionType": self.connection_type,
+            "status": "ready" if self.connected else "disconnected",
+            "lastError": self.last_error,
+            "lastChecked": self.last_checked,
+            "retryInSeconds": None if self.connected else max(0.0, round(self.next_attempt_at - time.monotonic(), 1))
+        }
+
+class PrinterMonitor:
+    """Background task that keeps a PrinterConnection healthy"""
+
+    def __init__(self, printer: PrinterConnection, interval: float = PrinterConfig.PROBE_INTERVAL_SECONDS):
+        self.printer = printer
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        # Set after every probe, so waiters re-check the link without connecting themselves
+        self._probed = asyncio.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            try:
+                await run_in_threadpool(self.printer.probe)
+            except Exception as e:
+                logger.error(f"Printer probe failed: {e}")
+            self._probed.set()
+            await asyncio.sleep(self.interval)
+
+    async def wait_online(self, timeout: float) -> bool:
+        """Wait until a probe finds the printer connected; False if it isn't by the timeout"""
+        deadline = time.monotonic() + timeout
+        while not self.printer.connected:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            self._probed.clear()
+            try:
+                await asyncio.wait_for(self._probed.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+        return True
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await run_in_threadpool(self.printer.disconnect)
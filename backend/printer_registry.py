@@ -0,0 +1,152 @@
+"""
+Named printers, routing rules and load balancing for the print server.
+Each printer has its own connection, health monitor and spool, so adding
+printers adds throughput. Configured from a JSON file (PRINTERS_CONFIG):
+
+    {
+      "printers": [
+        {"name": "kitchen-1", "group": "kitchen", "connection": "network", "network_ip": "192.168.1.101"},
+        {"name": "kitchen-2", "group": "kitchen", "connection": "network", "network_ip": "192.168.1.102"},
+        {"name": "breakfast", "group": "breakfast", "connection": "usb", "usb_serial": "RP326A0012", "paper_width": 48},
+        {"name": "breakfast-2", "group": "breakfast", "connection": "usb", "usb_bus": 1, "usb_address": 7}
+      ],
+      "routes": [
+        {"item": "Breakfast", "group": "breakfast"},
+        {"location": "Refex Nungambakkam", "group": "kitchen"}
+      ],
+      "defaultGroup": "kitchen",
+      "balancing": "least-queue"
+    }
+
+Printer keys other than name/group override PrinterConfig attributes; an entry
+with a network_ip and no connection is a network printer. Identical USB
+printers are told apart by usb_serial or usb_bus/usb_address. Routes
+are checked in order; a route matches when its location (if set) equals the
+ticket's and its item (if set) is on the ticket. Without a config file a
+single "default" printer is built from PrinterConfig.
+"""
+import itertools
+import json
+import logging
+import os
+from typing import Dict, List, Optional
+
+from printer_connection import PrinterConfig, PrinterConnection, PrinterMonitor
+from print_spool import PrintJob, PrintSpool, SpoolConfig
+
+logger = logging.getLogger(__name__)
+
+PRINTERS_CONFIG = os.environ.get("PRINTERS_CONFIG", os.path.join(os.path.dirname(os.path.abspath(__file__)), "printers.json"))
+
+BALANCING_STRATEGIES = ("least-queue", "round-robin")
+
+class RegisteredPrinter:
+    def __init__(self, name: str, group: str, connection: PrinterConnection):
+        self.name = name
+        self.group = group
+        self.connection = connection
+        self.monitor = PrinterMonitor(connection)
+        journal_dir = os.path.join(SpoolConfig.JOURNAL_DIR, name) if SpoolConfig.JOURNAL_DIR else None
+        self.spool = PrintSpool(connection, journal_dir=journal_dir, monitor=self.monitor)
+
+    def status(self) -> dict:
+        return {**self.connection.status(), "group": self.group, "queued": self.spool.depth}
+
+class PrinterRegistry:
+    def __init__(self, printers: List[RegisteredPrinter], routes: List[dict] = None,
+                 default_group: Optional[str] = None, balancing: str = "least-queue"):
+        if not printers:
+            raise ValueError("At least one printer must be configured")
+        if balancing not in BALANCING_STRATEGIES:
+            raise ValueError(f"Unknown balancing strategy: {balancing}")
+        self.printers: Dict[str, RegisteredPrinter] = {p.name: p for p in printers}
+        self.groups: Dict[str, List[RegisteredPrinter]] = {}
+        for p in printers:
+            self.groups.setdefault(p.group, []).append(p)
+        self.routes = routes or []
+        self.default_group = default_group or printers[0].group
+        self.balancing = balancing
+        self._round_robin = {group: itertools.cycle(members) for group, members in self.groups.items()}
+        for route in self.routes:
+            if route.get("group") not in self.groups:
+                raise ValueError(f"Route {route} targets unknown printer group")
+        if self.default_group not in self.groups:
+            raise ValueError(f"Unknown default printer group: {self.default_group}")
+
+    @classmethod
+    def from_config(cls, config: dict) -> "PrinterRegistry":
+        printers = []
+        for entry in config.get("printers", []):
+            entry = dict(entry)
+            name = entry.pop("name")
+            group = entry.pop("group", name)
+            # Otherwise "auto" would grab the first USB printer before trying the address
+            if entry.get("network_ip") and "connection" not in entry:
+                entry["connection"] = "network"
+            printers.append(RegisteredPrinter(name, group, PrinterConnection(PrinterConfig(**entry), name=name)))
+        return cls(
+            printers,
+            routes=config.get("routes"),
+            default_group=config.get("defaultGroup"),
+            balancing=config.get("balancing", "least-queue")
+        )
+
+    @classmethod
+    def load(cls, path: str = PRINTERS_CONFIG) -> "PrinterRegistry":
+        if not os.path.exists(path):
+            return cls([RegisteredPrinter("default", "default", PrinterConnection())])
+        with open(path) as f:
+            registry = cls.from_config(json.load(f))
+        logger.info(f"Loaded {len(registry.printers)} printer(s) from {path}")
+        return registry
+
+    @property
+    def primary(self) -> RegisteredPrinter:
+        return self.groups[self.default_group][0]
+
+    def start(self):
+        for p in self.printers.values():
+            p.monitor.start()
+            p.spool.start()
+
+    async def stop(self):
+        for p in self.printers.values():
+            await p.spool.stop()
+            await p.monitor.stop()
+
+    def group_for(self, location: Optional[str], items: List[dict]) -> str:
+        names = {str(item.get("name", "")).lower() for item in items}
+        for route in self.routes:
+            if route.get("location") and route["location"] != location:
+                continue
+            if route.get("item") and route["item"].lower() not in names:
+                continue
+            return route["group"]
+        return self.default_group
+
+    def pick(self, group: str) -> RegisteredPrinter:
+        """Choose a printer within a group, preferring connected ones"""
+        members = self.groups[group]
+        if len(members) == 1:
+            return members[0]
+        if self.balancing == "round-robin":
+            for _ in range(len(members)):
+                candidate = next(self._round_robin[group])
+                if candidate.connection.connected:
+                    return candidate
+            return next(self._round_robin[group])
+        # least-queue: shortest spool, connected printers first
+        return min(members, key=lambda p: (not p.connection.connected, p.spool.depth))
+
+    def route(self, location: Optional[str], items: List[dict]) -> RegisteredPrinter:
+        return self.pick(self.group_for(location, items))
+
+    def find_job(self, job_id: str) -> Optional[PrintJob]:
+        for p in self.printers.values():
+            job = p.spool.get(job_id)
+            if job:
+                return job
+        return None
+
+    def status(self) -> List[dict]:
+        return [p.status() for p in self.printers.values()]
@@ -0,0 +1,107 @@
+"""
+Pre-aggregated daily meal counts for the dashboard.
+One row per (date, created_by, company, customer type, meal), updated as bills are created.
+"""
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import BillingRecord, MealRollup
+from consumption import meal_quantities
+from upserts import increment_counters
+
+UNKNOWN_COMPANY = 'Unknown Company'
+
+def customer_type_of(is_guest: bool, is_support_staff: bool) -> str:
+    if is_guest:
+        return "guest"
+    if is_support_staff:
+        return "support_staff"
+    return "employee"
+
+def company_of(customer) -> str:
+    customer = customer if isinstance(customer, dict) else {}
+    return customer.get('companyName') or UNKNOWN_COMPANY
+
+def rollup_keys(bill) -> dict:
+    """Map each rollup key touched by a bill to the quantity it adds"""
+    base = (
+        bill.date,
+        bill.created_by,
+        company_of(bill.customer),
+        customer_type_of(bill.is_guest, bill.is_support_staff)
+    )
+    return {
+        base + (meal,): quantity
+        for meal, quantity in meal_quantities(bill.items).items()
+        if quantity
+    }
+
+def rollup_totals(bills) -> dict:
+    totals = {}
+    for bill in bills:
+        for key, quantity in rollup_keys(bill).items():
+            totals[key] = totals.get(key, 0) + quantity
+    return totals
+
+async def record_rollups(db: AsyncSession, bills):
+    """Add bills' meals to the rollup table in one round-trip (caller commits)"""
+    totals = rollup_totals(bills)
+    await increment_counters(
+        db,
+        MealRollup.__table__,
+        ("date", "created_by", "company_name", "customer_type", "meal"),
+        ("quantity",),
+        [
+            {
+                "date": date,
+                "created_by": created_by,
+                "company_name": company_name,
+                "customer_type": customer_type,
+                "meal": meal,
+                "quantity": quantity
+            }
+            for (date, created_by, company_name, customer_type, meal), quantity in totals.items()
+        ]
+    )
+
+async def record_rollup(db: AsyncSession, bill: BillingRecord):
+    """Add a bill's meals to the rollup table (caller commits)"""
+    await record_rollups(db, [bill])
+
+def rebuild_meal_rollups(db: Session) -> int:
+    """Rebuild the rollup table from billing history"""
+    db.query(MealRollup).delete()
+
+    totals = rollup_totals(db.query(
+        BillingRecord.date,
+        BillingRecord.created_by,
+        BillingRecord.is_guest,
+        BillingRecord.is_support_staff,
+        BillingRecord.customer,
+        BillingRecord.items
+    ).yield_per(1000))
+
+    db.bulk_insert_mappings(MealRollup, [
+        {
+            "date": date,
+            "created_by": created_by,
+            "company_name": company_name,
+            "customer_type": customer_type,
+            "meal": meal,
+            "quantity": quantity
+        }
+        for (date, created_by, company_name, customer_type, meal), quantity in totals.items()
+    ])
+    db.commit()
+    return len(totals)
+
+if __name__ == "__main__":
+    from database import SessionLocal, Base, engine
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        count = rebuild_meal_rollups(db)
+        print(f"Rebuilt meal rollups: {count} rows")
+    finally:
+        db.close()
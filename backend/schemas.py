@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -46,6 +46,7 @@ class EmployeeResponse(BaseModel):
     mobileNumber: Optional[str] = None
     location: Optional[str] = None
     qrCode: Optional[str] = None
+    isActive: bool = True
     createdBy: str
     createdDate: str
     
@@ -64,6 +65,7 @@ class EmployeeResponse(BaseModel):
             mobileNumber=obj.mobile_number,
             location=obj.location,
             qrCode=obj.qr_code,
+            isActive=obj.is_active,
             createdBy=obj.created_by,
             createdDate=obj.created_date
         )
@@ -93,6 +95,7 @@ class SupportStaffResponse(BaseModel):
     designation: Optional[str] = None
     companyName: Optional[str] = None
     biometricData: Optional[str] = None
+    isActive: bool = True
     createdBy: str
     createdDate: str
     
@@ -109,6 +112,7 @@ class SupportStaffResponse(BaseModel):
             designation=obj.designation,
             companyName=obj.company_name,
             biometricData=obj.biometric_data,
+            isActive=obj.is_active,
             createdBy=obj.created_by,
             createdDate=obj.created_date
         )
@@ -146,6 +150,25 @@ class BillingCreate(BaseModel):
     total_items: int
     total_amount: float
     pricing_type: str = "employee"
+    client_bill_id: Optional[str] = Field(None, max_length=64)
+
+class BillingBulkItem(BillingCreate):
+    client_bill_id: str = Field(..., min_length=1, max_length=64)
+
+class BillingBulkCreate(BaseModel):
+    bills: List[BillingBulkItem] = Field(..., min_length=1, max_length=500)
+
+class BillingBulkResult(BaseModel):
+    clientBillId: str
+    status: str  # "created", "duplicate" or "error"
+    id: Optional[int] = None
+    detail: Optional[str] = None
+
+class BillingBulkResponse(BaseModel):
+    results: List[BillingBulkResult]
+    created: int
+    duplicates: int
+    failed: int
 
 class BillingResponse(BaseModel):
     id: int
@@ -159,6 +182,7 @@ class BillingResponse(BaseModel):
     totalAmount: float
     pricingType: str
     createdBy: str
+    clientBillId: Optional[str] = None
     
     class Config:
         from_attributes = True
@@ -177,9 +201,22 @@ class BillingResponse(BaseModel):
             totalItems=obj.total_items,
             totalAmount=obj.total_amount,
             pricingType=obj.pricing_type,
-            createdBy=obj.created_by
+            createdBy=obj.created_by,
+            clientBillId=obj.client_bill_id
         )
 
+class BillingHistoryPage(BaseModel):
+    items: List[Dict[str, Any]]
+    nextCursor: Optional[str] = None
+
+class MealEligibility(BaseModel):
+    customerId: str
+    customerType: str
+    date: str
+    dailyLimit: int
+    consumedToday: Dict[str, int]
+    eligible: Dict[str, bool]
+
 # Price Master schemas
 class PriceMasterUpdate(BaseModel):
     employee_breakfast: float
@@ -189,6 +226,7 @@ class PriceMasterUpdate(BaseModel):
 
 class PriceMasterResponse(PriceMasterUpdate):
     id: int
+    version: int
     
     class Config:
         from_attributes = True
@@ -1,70 +1,139 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import APIRouter, FastAPI, HTTPException, Depends, Header, Query, Request, Response, BackgroundTasks, status
+from fastapi.responses import RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from sqlalchemy import String, select, insert, update, literal, and_, or_, func
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
-from typing import List, Optional
-import httpx
-from jose import JWTError, jwt
-from passlib.context import CryptContext
+from typing import List, Optional, Tuple
+import base64
+import binascii
+import hashlib
+import json
 
-from database import engine, SessionLocal, Base
-from models import User, Employee, SupportStaff, Guest, BillingRecord, PriceMaster
+from database import AsyncSessionLocal
+from models import User, Employee, SupportStaff, Guest, BillingRecord, MealRollup
+from consumption import DAILY_MEAL_LIMIT, billing_columns, business_date, record_consumption, record_consumptions, get_consumption
+from rollups import record_rollup, record_rollups, rollup_totals
+from dashboard_events import dashboard_broadcaster, stream_dashboard
+from exports import REPORT_FORMAT_PATTERN, stream_report
+from fastjson import FastJSONResponse, dumps, row_dicts
+from compression import CompressionMiddleware
+from metrics import MetricsMiddleware, metrics_response
+from directory import directory_cache, load_directory_entry
+from hrms_sync import fetch_hrms_payload, apply_hrms_sync
+from jobs import Job, job_queue
+from pricing import PriceSnapshot, PriceTable, price_cache, add_price_version
+from idempotency import bill_request_hash, recent_bills
+from auth_cache import AuthenticatedUser, TokenCache, role_for
+from passwords import PasswordWorkersBusy, password_workers, verify_and_update_password_async
 from schemas import (
     Token, UserCreate, UserLogin,
     EmployeeCreate, EmployeeUpdate, EmployeeResponse,
     SupportStaffCreate, SupportStaffUpdate, SupportStaffResponse,
     GuestCreate, GuestResponse,
-    BillingCreate, BillingResponse,
+    BillingCreate, BillingResponse, BillingHistoryPage, MealEligibility,
+    BillingBulkCreate, BillingBulkResponse,
     PriceMasterUpdate, PriceMasterResponse,
     DashboardStats, ReportFilter
 )
 from config import settings
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI(title="POS System API")
-
-# CORS Configuration
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify exact origins
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Schema and seed data are managed by bootstrap.py, not on import or startup
+router = APIRouter()
 
 # Security
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+token_cache = TokenCache(ttl=settings.TOKEN_CACHE_TTL_SECONDS, max_size=settings.TOKEN_CACHE_MAX_SIZE)
 
 # Database dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 # Utility functions
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+    from jose import jwt
+    
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def encode_history_cursor(created_at: datetime, record_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{record_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8")
+        created_at, record_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(record_id)
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def history_cursor_bound(db: AsyncSession, created_at: datetime):
+    # SQLite keeps CURRENT_TIMESTAMP as 'YYYY-MM-DD HH:MM:SS' text and compares it as a
+    # string, so the cursor must be bound in that format rather than with '.000000'
+    if db.get_bind().dialect.name == "sqlite":
+        timespec = "microseconds" if created_at.microsecond else "seconds"
+        return literal(created_at.isoformat(sep=" ", timespec=timespec), String)
+    return created_at
+
+def etag_for(content: bytes) -> str:
+    return '"' + hashlib.sha1(content).hexdigest() + '"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def cached_response(request: Request, content: bytes, media_type: str, cache_control: str = "private, no-cache") -> Response:
+    etag = etag_for(content)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=content, media_type=media_type, headers=headers)
+
+# QR images rarely change, so clients may keep them for 30 days and revalidate by ETag
+QR_CACHE_CONTROL = "private, max-age=2592000"
+
+def qr_image_response(request: Request, qr_code: Optional[str]) -> Response:
+    if not qr_code:
+        raise HTTPException(status_code=404, detail="QR code not found")
+    if qr_code.startswith(("http://", "https://")):
+        return RedirectResponse(qr_code, headers={"Cache-Control": QR_CACHE_CONTROL})
+    
+    # HRMS sends either a data URL or a bare base64 PNG
+    media_type = "image/png"
+    data = qr_code
+    if qr_code.startswith("data:"):
+        header, _, data = qr_code.partition(",")
+        media_type = header[len("data:"):].split(";")[0] or media_type
+    try:
+        image = base64.b64decode(data, validate=False)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail="Stored QR code is not a valid image")
+    return cached_response(request, image, media_type, cache_control=QR_CACHE_CONTROL)
+
+def token_claims(user: User) -> dict:
+    return {"sub": user.username, "uid": user.id, "role": role_for(user.username)}
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> AuthenticatedUser:
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+    
+    from jose import JWTError, jwt
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -78,362 +147,635 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
+    # Re-checked on every cache miss, so a deleted or renamed user loses access within
+    # TOKEN_CACHE_TTL_SECONDS; a uid claim also rejects a user recreated under the same name
+    result = await db.execute(select(User.id, User.username).where(User.username == username))
+    row = result.first()
+    # End the read so endpoints that open their own session don't wait on this connection
+    await db.close()
+    if row is None or payload.get("uid", row.id) != row.id:
         raise credentials_exception
+    user = AuthenticatedUser(row.id, row.username, role_for(row.username))
+    
+    token_cache.put(token, user, payload.get("exp"))
     return user
 
-# Initialize default users and price master on startup
-@app.on_event("startup")
 async def startup_event():
-    db = SessionLocal()
-    try:
-        # Create default users if they don't exist
-        default_users = [
-            {"username": "admin", "password": "password"},
-            {"username": "refextower", "password": "password"},
-            {"username": "bazullah", "password": "password"},
-        ]
-        
-        for user_data in default_users:
-            existing_user = db.query(User).filter(User.username == user_data["username"]).first()
-            if not existing_user:
-                hashed_password = get_password_hash(user_data["password"])
-                new_user = User(username=user_data["username"], hashed_password=hashed_password)
-                db.add(new_user)
-        
-        # Create default price master if it doesn't exist
-        existing_price = db.query(PriceMaster).first()
-        if not existing_price:
-            default_price = PriceMaster(
-                employee_breakfast=20,
-                employee_lunch=48,
-                company_breakfast=135,
-                company_lunch=165
-            )
-            db.add(default_price)
-        
-        db.commit()
-    finally:
-        db.close()
+    # Warm the badge lookup / search index so the first scan doesn't pay for the build
+    await directory_cache.refresh()
 
 # ==================== AUTH ENDPOINTS ====================
 
-@app.post("/api/auth/login", response_model=Token)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+@router.post("/api/auth/login", response_model=Token)
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    result = await db.execute(select(User).where(User.username == form_data.username))
+    user = result.scalars().first()
+    # Give the connection back while bcrypt runs on the password pool
+    await db.close()
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+        except PasswordWorkersBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins in progress, please try again",
+                headers={"Retry-After": "1"},
+            )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    if new_hash:
+        # Stored at an old cost factor; upgrade it while we have the password
+        await db.execute(update(User).where(User.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=token_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@app.get("/api/auth/verify")
-async def verify_token(current_user: User = Depends(get_current_user)):
-    return {"username": current_user.username, "id": current_user.id}
+@router.get("/api/auth/verify")
+async def verify_token(current_user: AuthenticatedUser = Depends(get_current_user)):
+    return {"username": current_user.username, "id": current_user.id, "role": current_user.role}
 
 # ==================== EMPLOYEE ENDPOINTS ====================
 
-@app.get("/api/employees", response_model=List[EmployeeResponse])
-async def get_employees(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    employees = db.query(Employee).all()
-    return [EmployeeResponse.from_orm(emp) for emp in employees]
+def labelled(fields: dict) -> list:
+    return [column.label(name) for name, column in fields.items()]
+
+# Client-facing field name -> column, in EmployeeResponse order
+EMPLOYEE_FIELDS = {
+    "id": Employee.id,
+    "employeeId": Employee.employee_id,
+    "employeeName": Employee.employee_name,
+    "companyName": Employee.company_name,
+    "entity": Employee.entity,
+    "mobileNumber": Employee.mobile_number,
+    "location": Employee.location,
+    "qrCode": Employee.qr_code,
+    "isActive": Employee.is_active,
+    "createdBy": Employee.created_by,
+    "createdDate": Employee.created_date,
+}
+
+@router.get("/api/employees", response_model=List[EmployeeResponse])
+async def get_employees(db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(*labelled(EMPLOYEE_FIELDS)))
+    return FastJSONResponse(row_dicts(result))
 
-@app.post("/api/employees", response_model=EmployeeResponse)
-async def create_employee(employee: EmployeeCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.get("/api/employees/search")
+async def search_directory(
+    q: str = Query(..., min_length=1),
+    types: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    type_filter = {t.strip() for t in types.split(",") if t.strip()} if types else None
+    # Right after a write this is the previous index, rebuilt in the background
+    index = await directory_cache.current()
+    return [entry.to_dict() for entry in index.search(q, limit=limit, types=type_filter)]
+
+@router.get("/api/employees/directory")
+async def get_employee_directory(request: Request, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    rows = await db.execute(
+        select(
+            Employee.id,
+            Employee.employee_id,
+            Employee.employee_name,
+            Employee.company_name,
+            Employee.location
+        ).where(Employee.is_active == True).order_by(Employee.id)
+    )
+    directory = [
+        {
+            "id": row.id,
+            "employeeId": row.employee_id,
+            "employeeName": row.employee_name,
+            "companyName": row.company_name,
+            "location": row.location
+        }
+        for row in rows
+    ]
+    return cached_response(request, dumps(directory), "application/json")
+
+@router.get("/api/employees/{employee_id}/qr")
+async def get_employee_qr(employee_id: int, request: Request, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(Employee.qr_code).where(Employee.id == employee_id))
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Employee not found")
+    return qr_image_response(request, row.qr_code)
+
+@router.post("/api/employees", response_model=EmployeeResponse)
+async def create_employee(employee: EmployeeCreate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     # Check if employee ID already exists
-    existing = db.query(Employee).filter(Employee.employee_id == employee.employee_id).first()
+    result = await db.execute(select(Employee.id).where(Employee.employee_id == employee.employee_id))
+    existing = result.first()
     if existing:
         raise HTTPException(status_code=400, detail="Employee ID already exists")
     
     db_employee = Employee(**employee.dict(), created_by=current_user.username)
     db.add(db_employee)
-    db.commit()
-    db.refresh(db_employee)
+    await db.commit()
+    directory_cache.invalidate()
+    await db.refresh(db_employee)
     return EmployeeResponse.from_orm(db_employee)
 
-@app.put("/api/employees/{employee_id}", response_model=EmployeeResponse)
-async def update_employee(employee_id: int, employee: EmployeeUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_employee = db.query(Employee).filter(Employee.id == employee_id).first()
+@router.put("/api/employees/{employee_id}", response_model=EmployeeResponse)
+async def update_employee(employee_id: int, employee: EmployeeUpdate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    db_employee = await db.get(Employee, employee_id)
     if not db_employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
     for key, value in employee.dict(exclude_unset=True).items():
         setattr(db_employee, key, value)
     
-    db.commit()
-    db.refresh(db_employee)
+    await db.commit()
+    directory_cache.invalidate()
+    await db.refresh(db_employee)
     return EmployeeResponse.from_orm(db_employee)
 
-@app.delete("/api/employees/{employee_id}")
-async def delete_employee(employee_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_employee = db.query(Employee).filter(Employee.id == employee_id).first()
+@router.delete("/api/employees/{employee_id}")
+async def delete_employee(employee_id: int, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    db_employee = await db.get(Employee, employee_id)
     if not db_employee:
         raise HTTPException(status_code=404, detail="Employee not found")
     
-    db.delete(db_employee)
-    db.commit()
+    await db.delete(db_employee)
+    await db.commit()
+    directory_cache.invalidate()
     return {"message": "Employee deleted successfully"}
 
-@app.post("/api/employees/sync-hrms")
-async def sync_hrms(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                settings.HRMS_API_URL,
-                headers={
-                    "Authorization": settings.HRMS_API_TOKEN,
-                    "Content-Type": "application/json",
-                    "Accept": "application/json"
-                },
-                timeout=30.0
-            )
-            response.raise_for_status()
-            api_response = response.json()
-            
-            hrms_employees = api_response if isinstance(api_response, list) else api_response.get("results", [])
-            
-            support_staff_designations = ['Driver', 'Office Assistant']
-            new_employees_count = 0
-            new_support_staff_count = 0
-            
-            for emp in hrms_employees:
-                designation = emp.get('designation', '')
-                is_support = any(d.lower() in designation.lower() for d in support_staff_designations)
-                
-                if is_support:
-                    staff_id = emp.get('employee_id', '')
-                    existing = db.query(SupportStaff).filter(SupportStaff.staff_id == staff_id).first()
-                    if not existing and staff_id:
-                        new_staff = SupportStaff(
-                            staff_id=staff_id,
-                            name=emp.get('employee_name', ''),
-                            designation=designation,
-                            company_name=emp.get('company', {}).get('company_name', ''),
-                            biometric_data=emp.get('qr_code_image', ''),
-                            created_by='HRMS Sync'
-                        )
-                        db.add(new_staff)
-                        new_support_staff_count += 1
-                else:
-                    employee_id = emp.get('employee_id', '')
-                    existing = db.query(Employee).filter(Employee.employee_id == employee_id).first()
-                    if not existing and employee_id:
-                        new_employee = Employee(
-                            employee_id=employee_id,
-                            employee_name=emp.get('employee_name', ''),
-                            company_name=emp.get('company', {}).get('company_name', ''),
-                            entity=designation,
-                            mobile_number=emp.get('mobile_number', ''),
-                            location=emp.get('branch', {}).get('branch_name', ''),
-                            qr_code=emp.get('qr_code_image', ''),
-                            created_by='HRMS Sync'
-                        )
-                        db.add(new_employee)
-                        new_employees_count += 1
-            
-            db.commit()
-            return {
-                "message": "HRMS sync completed",
-                "new_employees": new_employees_count,
-                "new_support_staff": new_support_staff_count
-            }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"HRMS sync failed: {str(e)}")
+async def hrms_sync_job(job: Job) -> dict:
+    on_page = lambda fetched: job.update_progress(fetched=fetched)
+    payload = await fetch_hrms_payload(settings.HRMS_API_URL, settings.HRMS_API_TOKEN, on_page=on_page)
+    
+    on_progress = lambda processed, written: job.update_progress(processed=processed, written=written)
+    result = await run_in_threadpool(apply_hrms_sync, payload, on_progress)
+    directory_cache.invalidate()
+    return result.to_dict()
+
+@router.post("/api/employees/sync-hrms", status_code=status.HTTP_202_ACCEPTED)
+async def sync_hrms(current_user: AuthenticatedUser = Depends(get_current_user)):
+    job, created = await job_queue.submit("hrms_sync", hrms_sync_job)
+    return {
+        "message": "HRMS sync started" if created else "HRMS sync already in progress",
+        "jobId": job.id,
+        "status": job.status
+    }
 
 # ==================== SUPPORT STAFF ENDPOINTS ====================
 
-@app.get("/api/support-staff", response_model=List[SupportStaffResponse])
-async def get_support_staff(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    staff = db.query(SupportStaff).all()
-    return [SupportStaffResponse.from_orm(s) for s in staff]
+# Client-facing field name -> column, in SupportStaffResponse order
+SUPPORT_STAFF_FIELDS = {
+    "id": SupportStaff.id,
+    "staffId": SupportStaff.staff_id,
+    "name": SupportStaff.name,
+    "designation": SupportStaff.designation,
+    "companyName": SupportStaff.company_name,
+    "biometricData": SupportStaff.biometric_data,
+    "isActive": SupportStaff.is_active,
+    "createdBy": SupportStaff.created_by,
+    "createdDate": SupportStaff.created_date,
+}
+
+@router.get("/api/support-staff", response_model=List[SupportStaffResponse])
+async def get_support_staff(db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(*labelled(SUPPORT_STAFF_FIELDS)))
+    return FastJSONResponse(row_dicts(result))
+
+@router.get("/api/support-staff/directory")
+async def get_support_staff_directory(request: Request, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    rows = await db.execute(
+        select(
+            SupportStaff.id,
+            SupportStaff.staff_id,
+            SupportStaff.name,
+            SupportStaff.designation,
+            SupportStaff.company_name
+        ).where(SupportStaff.is_active == True).order_by(SupportStaff.id)
+    )
+    directory = [
+        {
+            "id": row.id,
+            "staffId": row.staff_id,
+            "name": row.name,
+            "designation": row.designation,
+            "companyName": row.company_name
+        }
+        for row in rows
+    ]
+    return cached_response(request, dumps(directory), "application/json")
+
+@router.get("/api/support-staff/{staff_id}/qr")
+async def get_support_staff_qr(staff_id: int, request: Request, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(SupportStaff.biometric_data).where(SupportStaff.id == staff_id))
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Support staff not found")
+    return qr_image_response(request, row.biometric_data)
 
-@app.post("/api/support-staff", response_model=SupportStaffResponse)
-async def create_support_staff(staff: SupportStaffCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    existing = db.query(SupportStaff).filter(SupportStaff.staff_id == staff.staff_id).first()
+@router.post("/api/support-staff", response_model=SupportStaffResponse)
+async def create_support_staff(staff: SupportStaffCreate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(SupportStaff.id).where(SupportStaff.staff_id == staff.staff_id))
+    existing = result.first()
     if existing:
         raise HTTPException(status_code=400, detail="Staff ID already exists")
     
     db_staff = SupportStaff(**staff.dict(), created_by=current_user.username)
     db.add(db_staff)
-    db.commit()
-    db.refresh(db_staff)
+    await db.commit()
+    directory_cache.invalidate()
+    await db.refresh(db_staff)
     return SupportStaffResponse.from_orm(db_staff)
 
-@app.put("/api/support-staff/{staff_id}", response_model=SupportStaffResponse)
-async def update_support_staff(staff_id: int, staff: SupportStaffUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_staff = db.query(SupportStaff).filter(SupportStaff.id == staff_id).first()
+@router.put("/api/support-staff/{staff_id}", response_model=SupportStaffResponse)
+async def update_support_staff(staff_id: int, staff: SupportStaffUpdate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    db_staff = await db.get(SupportStaff, staff_id)
     if not db_staff:
         raise HTTPException(status_code=404, detail="Support staff not found")
     
     for key, value in staff.dict(exclude_unset=True).items():
         setattr(db_staff, key, value)
     
-    db.commit()
-    db.refresh(db_staff)
+    await db.commit()
+    directory_cache.invalidate()
+    await db.refresh(db_staff)
     return SupportStaffResponse.from_orm(db_staff)
 
-@app.delete("/api/support-staff/{staff_id}")
-async def delete_support_staff(staff_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_staff = db.query(SupportStaff).filter(SupportStaff.id == staff_id).first()
+@router.delete("/api/support-staff/{staff_id}")
+async def delete_support_staff(staff_id: int, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    db_staff = await db.get(SupportStaff, staff_id)
     if not db_staff:
         raise HTTPException(status_code=404, detail="Support staff not found")
     
-    db.delete(db_staff)
-    db.commit()
+    await db.delete(db_staff)
+    await db.commit()
+    directory_cache.invalidate()
     return {"message": "Support staff deleted successfully"}
 
 # ==================== GUEST ENDPOINTS ====================
 
-@app.get("/api/guests", response_model=List[GuestResponse])
-async def get_guests(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    guests = db.query(Guest).all()
-    return [GuestResponse.from_orm(g) for g in guests]
+@router.get("/api/guests", response_model=List[GuestResponse])
+async def get_guests(db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    result = await db.execute(select(Guest.id.label("id"), Guest.name.label("name"), Guest.company_name.label("companyName")))
+    return FastJSONResponse(row_dicts(result))
 
-@app.post("/api/guests", response_model=GuestResponse)
-async def create_guest(guest: GuestCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+@router.post("/api/guests", response_model=GuestResponse)
+async def create_guest(guest: GuestCreate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
     db_guest = Guest(**guest.dict())
     db.add(db_guest)
-    db.commit()
-    db.refresh(db_guest)
+    await db.commit()
+    directory_cache.invalidate()
+    await db.refresh(db_guest)
     return GuestResponse.from_orm(db_guest)
 
 # ==================== BILLING ENDPOINTS ====================
 
-@app.get("/api/billing/history", response_model=List[BillingResponse])
+# Client-facing field name -> column, in BillingResponse order
+BILLING_HISTORY_FIELDS = {
+    "id": BillingRecord.id,
+    "date": BillingRecord.date,
+    "time": BillingRecord.time,
+    "isGuest": BillingRecord.is_guest,
+    "isSupportStaff": BillingRecord.is_support_staff,
+    "customer": BillingRecord.customer,
+    "items": BillingRecord.items,
+    "totalItems": BillingRecord.total_items,
+    "totalAmount": BillingRecord.total_amount,
+    "pricingType": BillingRecord.pricing_type,
+    "createdBy": BillingRecord.created_by,
+    "clientBillId": BillingRecord.client_bill_id,
+}
+
+@router.get("/api/billing/history", response_model=BillingHistoryPage)
 async def get_billing_history(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
-    query = db.query(BillingRecord)
+    if fields:
+        requested = [f.strip() for f in fields.split(",") if f.strip()]
+        unknown = [f for f in requested if f not in BILLING_HISTORY_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    else:
+        requested = list(BILLING_HISTORY_FIELDS)
+    
+    # Only the projected columns are loaded, plus the keyset columns for the cursor
+    query = select(
+        *[BILLING_HISTORY_FIELDS[f].label(f) for f in requested],
+        BillingRecord.created_at.label("cursor_created_at"),
+        BillingRecord.id.label("cursor_id")
+    )
     
     # Role-based filtering: admin sees all, others see only their own records
     if current_user.username != "admin":
-        query = query.filter(BillingRecord.created_by == current_user.username)
+        query = query.where(BillingRecord.created_by == current_user.username)
     
     if start_date:
-        query = query.filter(BillingRecord.date >= start_date)
+        query = query.where(BillingRecord.date >= start_date)
     if end_date:
-        query = query.filter(BillingRecord.date <= end_date)
+        query = query.where(BillingRecord.date <= end_date)
+    
+    if cursor:
+        cursor_created_at, cursor_id = decode_history_cursor(cursor)
+        cursor_created_at = history_cursor_bound(db, cursor_created_at)
+        query = query.where(or_(
+            BillingRecord.created_at < cursor_created_at,
+            and_(BillingRecord.created_at == cursor_created_at, BillingRecord.id < cursor_id)
+        ))
+    
+    result = await db.execute(query.order_by(BillingRecord.created_at.desc(), BillingRecord.id.desc()).limit(limit + 1))
+    rows = result.all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].cursor_created_at, rows[-1].cursor_id)
+    
+    return FastJSONResponse({
+        "items": [{f: row._mapping[f] for f in requested} for row in rows],
+        "nextCursor": next_cursor
+    })
+
+@router.get("/api/billing/eligibility", response_model=MealEligibility)
+async def get_meal_eligibility(
+    customer_id: str,
+    customer_type: str = "employee",
+    date: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    if customer_type not in ("employee", "support_staff"):
+        raise HTTPException(status_code=400, detail="customer_type must be 'employee' or 'support_staff'")
     
-    records = query.order_by(BillingRecord.created_at.desc()).all()
-    return [BillingResponse.from_orm(record) for record in records]
+    date = date or business_date()
+    consumed = await get_consumption(db, date, customer_type, customer_id)
+    
+    return {
+        "customerId": customer_id,
+        "customerType": customer_type,
+        "date": date,
+        "dailyLimit": DAILY_MEAL_LIMIT,
+        "consumedToday": consumed,
+        "eligible": {meal: count < DAILY_MEAL_LIMIT for meal, count in consumed.items()}
+    }
 
-@app.post("/api/billing/create", response_model=BillingResponse)
-async def create_billing(billing: BillingCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    db_billing = BillingRecord(**billing.dict(), created_by=current_user.username)
-    db.add(db_billing)
-    db.commit()
-    db.refresh(db_billing)
-    return BillingResponse.from_orm(db_billing)
+async def find_client_bill(db: AsyncSession, client_bill_id: str, username: str) -> Optional[Tuple[BillingResponse, Optional[str]]]:
+    result = await db.execute(select(BillingRecord).where(BillingRecord.client_bill_id == client_bill_id))
+    original = result.scalars().first()
+    if original is None:
+        return None
+    if original.created_by != username:
+        raise HTTPException(status_code=409, detail="Idempotency key already used by another counter")
+    response = BillingResponse.from_orm(original)
+    recent_bills.put(username, client_bill_id, response, original.client_bill_hash)
+    return response, original.client_bill_hash
 
-# ==================== PRICE MASTER ENDPOINTS ====================
+def replayed_bill(stored: Tuple[BillingResponse, Optional[str]], request_hash: str) -> BillingResponse:
+    response, stored_hash = stored
+    # Bills stored before request hashes were kept have none to compare
+    if stored_hash is not None and stored_hash != request_hash:
+        raise HTTPException(status_code=422, detail="Idempotency key was already used for a different bill")
+    return response
+
+# A bill's transaction is retried once if it deadlocks on the counter tables
+BILLING_TRANSACTION_ATTEMPTS = 2
+
+@router.post("/api/billing/create", response_model=BillingResponse)
+async def create_billing(
+    billing: BillingCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=64),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    if idempotency_key and billing.client_bill_id and idempotency_key != billing.client_bill_id:
+        raise HTTPException(status_code=400, detail="Idempotency-Key header does not match client_bill_id")
+    client_bill_id = idempotency_key or billing.client_bill_id
+    request_hash = bill_request_hash(billing.dict()) if client_bill_id else None
+    
+    # A retry of a bill that was already stored gets the original back
+    if client_bill_id:
+        original = recent_bills.get(current_user.username, client_bill_id)
+        if original is None:
+            original = await find_client_bill(db, client_bill_id, current_user.username)
+        if original is not None:
+            return replayed_bill(original, request_hash)
+    
+    columns = dict(
+        **billing.dict(exclude={"client_bill_id"}),
+        **billing_columns(billing.is_guest, billing.is_support_staff, billing.customer, billing.items),
+        client_bill_id=client_bill_id,
+        client_bill_hash=request_hash,
+        price_version=(await price_cache.current(db)).version,
+        created_by=current_user.username
+    )
+    for attempt in range(BILLING_TRANSACTION_ATTEMPTS):
+        db_billing = BillingRecord(**columns)
+        db.add(db_billing)
+        try:
+            # Keep the daily consumption index in the same transaction as the bill
+            await record_consumption(db, db_billing)
+            await record_rollup(db, db_billing)
+            await db.commit()
+            break
+        except IntegrityError:
+            # A concurrent retry with the same key won the insert
+            await db.rollback()
+            original = await find_client_bill(db, client_bill_id, current_user.username) if client_bill_id else None
+            if original is None:
+                raise
+            return replayed_bill(original, request_hash)
+        except OperationalError:
+            # Deadlock or lock timeout against another counter; the whole bill is retried
+            await db.rollback()
+            if attempt + 1 == BILLING_TRANSACTION_ATTEMPTS:
+                raise
+    await db.refresh(db_billing)
+    dashboard_broadcaster.publish(rollup_totals([db_billing]))
+    
+    response = BillingResponse.from_orm(db_billing)
+    recent_bills.put(current_user.username, client_bill_id, response, request_hash)
+    return response
 
-@app.get("/api/price-master", response_model=PriceMasterResponse)
-async def get_price_master(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    price_master = db.query(PriceMaster).first()
-    if not price_master:
-        # Create default if doesn't exist
-        price_master = PriceMaster(
-            employee_breakfast=20,
-            employee_lunch=48,
-            company_breakfast=135,
-            company_lunch=165
+@router.post("/api/billing/bulk", response_model=BillingBulkResponse)
+async def create_billing_bulk(payload: BillingBulkCreate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    keys = {bill.client_bill_id for bill in payload.bills}
+    result = await db.execute(
+        select(BillingRecord.id, BillingRecord.client_bill_id, BillingRecord.created_by, BillingRecord.client_bill_hash)
+        .where(BillingRecord.client_bill_id.in_(keys))
+    )
+    existing = {row.client_bill_id: row for row in result}
+    
+    # Keys already stored (or repeated within this batch) are replays, not new bills
+    price_version = (await price_cache.current(db)).version
+    request_hashes = [bill_request_hash(bill.dict()) for bill in payload.bills]
+    new_rows = {}
+    for bill, request_hash in zip(payload.bills, request_hashes):
+        if bill.client_bill_id in existing or bill.client_bill_id in new_rows:
+            continue
+        new_rows[bill.client_bill_id] = {
+            **bill.dict(),
+            **billing_columns(bill.is_guest, bill.is_support_staff, bill.customer, bill.items),
+            "client_bill_hash": request_hash,
+            "price_version": price_version,
+            "created_by": current_user.username
+        }
+    
+    created_ids = {}
+    if new_rows:
+        bills = [BillingRecord(**row) for row in new_rows.values()]
+        for attempt in range(BILLING_TRANSACTION_ATTEMPTS):
+            try:
+                # The insert runs immediately, so a concurrent duplicate key fails here, not at commit
+                await db.execute(insert(BillingRecord), list(new_rows.values()))
+                await record_consumptions(db, bills)
+                await record_rollups(db, bills)
+                await db.commit()
+                break
+            except IntegrityError:
+                # Another request stored some of these keys first; replaying the batch is safe
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="Some bills were submitted concurrently, please retry")
+            except OperationalError:
+                # Deadlock or lock timeout against another counter; the whole batch is retried
+                await db.rollback()
+                if attempt + 1 == BILLING_TRANSACTION_ATTEMPTS:
+                    raise
+        dashboard_broadcaster.publish(rollup_totals(bills))
+        result = await db.execute(
+            select(BillingRecord.id, BillingRecord.client_bill_id)
+            .where(BillingRecord.client_bill_id.in_(list(new_rows)))
         )
-        db.add(price_master)
-        db.commit()
-        db.refresh(price_master)
-    return price_master
-
-@app.put("/api/price-master", response_model=PriceMasterResponse)
-async def update_price_master(price: PriceMasterUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    price_master = db.query(PriceMaster).first()
-    if not price_master:
-        price_master = PriceMaster(**price.dict())
-        db.add(price_master)
+        created_ids = {row.client_bill_id: row.id for row in result}
+    
+    results = []
+    reported = set()
+    for bill, request_hash in zip(payload.bills, request_hashes):
+        key = bill.client_bill_id
+        row = existing.get(key)
+        stored_hash = row.client_bill_hash if row is not None else new_rows.get(key, {}).get("client_bill_hash")
+        if row is not None and row.created_by != current_user.username:
+            results.append({"clientBillId": key, "status": "error", "detail": "Key already used by another counter"})
+        elif stored_hash is not None and stored_hash != request_hash:
+            results.append({"clientBillId": key, "status": "error", "detail": "Key already used for a different bill"})
+        elif key in created_ids and key not in reported:
+            reported.add(key)
+            results.append({"clientBillId": key, "status": "created", "id": created_ids[key]})
+        else:
+            results.append({"clientBillId": key, "status": "duplicate", "id": created_ids.get(key) or row.id})
+    
+    return {
+        "results": results,
+        "created": sum(1 for r in results if r["status"] == "created"),
+        "duplicates": sum(1 for r in results if r["status"] == "duplicate"),
+        "failed": sum(1 for r in results if r["status"] == "error")
+    }
+
+@router.get("/api/lookup/{code}")
+async def lookup_code(
+    code: str,
+    background_tasks: BackgroundTasks,
+    date: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    index = directory_cache.peek()
+    if index is not None:
+        entry = index.lookup(code)
     else:
-        for key, value in price.dict().items():
-            setattr(price_master, key, value)
+        # Index is stale after a write: answer from the database and rebuild off-request
+        entry = await load_directory_entry(db, code.strip())
+    
+    if entry is None:
+        raise HTTPException(status_code=404, detail="No employee or support staff found for this code")
+    
+    date = date or business_date()
+    consumed = await get_consumption(db, date, entry.type, entry.code)
     
-    db.commit()
-    db.refresh(price_master)
-    return price_master
+    if index is None:
+        # Background tasks run before the request session is closed, and the rebuild
+        # opens its own; hand the connection back so it doesn't wait on ours
+        await db.close()
+        background_tasks.add_task(directory_cache.refresh)
+    
+    return {
+        **entry.to_dict(),
+        "date": date,
+        "dailyLimit": DAILY_MEAL_LIMIT,
+        "consumedToday": consumed,
+        "eligible": {meal: count < DAILY_MEAL_LIMIT for meal, count in consumed.items()}
+    }
+
+# ==================== PRICE MASTER ENDPOINTS ====================
+
+@router.get("/api/price-master", response_model=PriceMasterResponse)
+async def get_price_master(request: Request, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    price_master = await price_cache.current(db)
+    return cached_response(request, json.dumps(price_master.to_dict()).encode("utf-8"), "application/json")
+
+@router.put("/api/price-master", response_model=PriceMasterResponse)
+async def update_price_master(price: PriceMasterUpdate, db: AsyncSession = Depends(get_db), current_user: AuthenticatedUser = Depends(get_current_user)):
+    # Prices are versioned rather than overwritten, so old bills keep their valuation
+    try:
+        # The new version number is flushed right away, so a concurrent update collides here
+        price_master = await add_price_version(db, price.dict())
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail="Prices were updated concurrently, please retry")
+    price_cache.invalidate()
+    return PriceSnapshot.from_row(price_master).to_dict()
 
 # ==================== DASHBOARD ENDPOINTS ====================
 
-@app.get("/api/dashboard/stats")
-async def get_dashboard_stats(
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    query = db.query(BillingRecord)
+async def dashboard_stats(db: AsyncSession, username: str, start_date: Optional[str], end_date: Optional[str]) -> dict:
+    query = select(
+        MealRollup.company_name,
+        MealRollup.customer_type,
+        MealRollup.meal,
+        func.sum(MealRollup.quantity).label("quantity")
+    )
     
     # Role-based filtering: admin sees all, others see only their own records
-    if current_user.username != "admin":
-        query = query.filter(BillingRecord.created_by == current_user.username)
+    if username != "admin":
+        query = query.where(MealRollup.created_by == username)
     
     if start_date:
-        query = query.filter(BillingRecord.date >= start_date)
+        query = query.where(MealRollup.date >= start_date)
     if end_date:
-        query = query.filter(BillingRecord.date <= end_date)
+        query = query.where(MealRollup.date <= end_date)
     
-    bills = query.all()
+    rows = await db.execute(query.group_by(MealRollup.company_name, MealRollup.customer_type, MealRollup.meal))
     
     stats = {
         "breakfast": {"employee": 0, "supportStaff": 0, "guest": 0, "total": 0},
         "lunch": {"employee": 0, "supportStaff": 0, "guest": 0, "total": 0}
     }
+    stat_keys = {"employee": "employee", "support_staff": "supportStaff", "guest": "guest"}
     
     company_stats = {}
     
-    for bill in bills:
-        items = bill.items if isinstance(bill.items, list) else []
-        
-        for item in items:
-            if item.get('name') == 'Breakfast':
-                qty = item.get('quantity', 0)
-                if bill.is_guest:
-                    stats['breakfast']['guest'] += qty
-                elif bill.is_support_staff:
-                    stats['breakfast']['supportStaff'] += qty
-                else:
-                    stats['breakfast']['employee'] += qty
-                stats['breakfast']['total'] += qty
-            elif item.get('name') == 'Lunch':
-                qty = item.get('quantity', 0)
-                if bill.is_guest:
-                    stats['lunch']['guest'] += qty
-                elif bill.is_support_staff:
-                    stats['lunch']['supportStaff'] += qty
-                else:
-                    stats['lunch']['employee'] += qty
-                stats['lunch']['total'] += qty
+    for row in rows:
+        qty = int(row.quantity or 0)
+        stats[row.meal][stat_keys[row.customer_type]] += qty
+        stats[row.meal]['total'] += qty
         
         # Company-wise stats
-        customer = bill.customer if isinstance(bill.customer, dict) else {}
-        company_name = customer.get('companyName', 'Unknown Company')
-        
-        if company_name not in company_stats:
-            company_stats[company_name] = {"name": company_name, "breakfast": 0, "lunch": 0, "total": 0}
-        
-        for item in items:
-            if item.get('name') == 'Breakfast':
-                company_stats[company_name]['breakfast'] += item.get('quantity', 0)
-            elif item.get('name') == 'Lunch':
-                company_stats[company_name]['lunch'] += item.get('quantity', 0)
-        
-        company_stats[company_name]['total'] = company_stats[company_name]['breakfast'] + company_stats[company_name]['lunch']
+        if row.company_name not in company_stats:
+            company_stats[row.company_name] = {"name": row.company_name, "breakfast": 0, "lunch": 0, "total": 0}
+        company_stats[row.company_name][row.meal] += qty
+        company_stats[row.company_name]['total'] += qty
     
     company_wise_data = sorted(company_stats.values(), key=lambda x: x['total'], reverse=True)
     
@@ -442,209 +784,342 @@ async def get_dashboard_stats(
         "companyWiseData": company_wise_data
     }
 
-# ==================== REPORTS ENDPOINTS ====================
+@router.get("/api/dashboard/stats")
+async def get_dashboard_stats(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    return await dashboard_stats(db, current_user.username, start_date, end_date)
 
-@app.get("/api/reports/employee")
-async def get_employee_report(
+@router.get("/api/dashboard/stream")
+async def stream_dashboard_stats(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    employee_id: Optional[str] = None,
-    company: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
-    query = db.query(BillingRecord).filter(BillingRecord.is_support_staff == False)
+    """Server-Sent Events: a stats snapshot, then deltas as bills are created"""
+    username = current_user.username
+    # Subscribe before reading the snapshot so a bill committed meanwhile can't be
+    # missed (in a narrow race it is counted twice until the next snapshot)
+    subscription = dashboard_broadcaster.subscribe(
+        None if username == "admin" else username, start_date, end_date
+    )
+    try:
+        snapshot = await dashboard_stats(db, username, start_date, end_date)
+    except Exception:
+        dashboard_broadcaster.unsubscribe(subscription)
+        raise
+    # The stream can stay open for hours; don't hold a pooled connection for it
+    await db.close()
+    
+    async def load_snapshot():
+        async with AsyncSessionLocal() as session:
+            return await dashboard_stats(session, username, start_date, end_date)
+    
+    return stream_dashboard(dashboard_broadcaster, subscription, snapshot, load_snapshot)
+
+# ==================== REPORTS ENDPOINTS ====================
+
+def employee_report_query(username: str, start_date, end_date, employee_id, company):
+    query = select(
+        BillingRecord.id,
+        BillingRecord.date,
+        BillingRecord.time,
+        BillingRecord.is_guest,
+        BillingRecord.customer_id,
+        BillingRecord.customer_name,
+        BillingRecord.company_name,
+        BillingRecord.breakfast_qty,
+        BillingRecord.lunch_qty,
+        BillingRecord.breakfast_exception_qty,
+        BillingRecord.lunch_exception_qty,
+        BillingRecord.total_items,
+        BillingRecord.total_amount
+    ).where(BillingRecord.is_support_staff == False)
     
     # Role-based filtering: admin sees all, others see only their own records
-    if current_user.username != "admin":
-        query = query.filter(BillingRecord.created_by == current_user.username)
+    if username != "admin":
+        query = query.where(BillingRecord.created_by == username)
     
     if start_date:
-        query = query.filter(BillingRecord.date >= start_date)
+        query = query.where(BillingRecord.date >= start_date)
     if end_date:
-        query = query.filter(BillingRecord.date <= end_date)
+        query = query.where(BillingRecord.date <= end_date)
     
-    bills = query.all()
+    # Guests are reported under the pseudo ID "GUEST"
+    if employee_id == 'GUEST':
+        query = query.where(BillingRecord.is_guest == True)
+    elif employee_id:
+        query = query.where(BillingRecord.customer_id == employee_id, BillingRecord.is_guest == False)
+    if company:
+        query = query.where(BillingRecord.company_name == company)
     
-    report_data = []
-    for bill in bills:
-        customer = bill.customer if isinstance(bill.customer, dict) else {}
-        items = bill.items if isinstance(bill.items, list) else []
-        
-        breakfast = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Breakfast')
-        lunch = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Lunch')
-        breakfast_exceptions = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Breakfast' and item.get('isException'))
-        lunch_exceptions = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Lunch' and item.get('isException'))
-        
-        record = {
-            "id": bill.id,
-            "employeeId": 'GUEST' if bill.is_guest else customer.get('employeeId', 'N/A'),
-            "employeeName": customer.get('name', '') if bill.is_guest else customer.get('employeeName', 'Unknown'),
-            "company": customer.get('companyName', 'N/A'),
-            "date": bill.date,
-            "time": bill.time,
-            "breakfast": breakfast,
-            "lunch": lunch,
-            "breakfastExceptions": breakfast_exceptions,
-            "lunchExceptions": lunch_exceptions,
-            "totalItems": bill.total_items,
-            "amount": bill.total_amount,
-            "isGuest": bill.is_guest,
-            "hasExceptions": breakfast_exceptions > 0 or lunch_exceptions > 0
-        }
-        
-        # Apply filters
-        if employee_id and record['employeeId'] != employee_id:
-            continue
-        if company and record['company'] != company:
-            continue
-        
-        report_data.append(record)
-    
-    return report_data
+    return query.order_by(BillingRecord.id)
 
-@app.get("/api/reports/support-staff")
-async def get_support_staff_report(
+# Export columns, in the order the row function builds them
+EMPLOYEE_REPORT_COLUMNS = [
+    "id",
+    "employeeId",
+    "employeeName",
+    "company",
+    "date",
+    "time",
+    "breakfast",
+    "lunch",
+    "breakfastExceptions",
+    "lunchExceptions",
+    "totalItems",
+    "amount",
+    "isGuest",
+    "hasExceptions"
+]
+
+def employee_report_row(bill) -> dict:
+    return {
+        "id": bill.id,
+        "employeeId": 'GUEST' if bill.is_guest else (bill.customer_id or 'N/A'),
+        "employeeName": bill.customer_name if bill.is_guest else (bill.customer_name or 'Unknown'),
+        "company": bill.company_name or 'N/A',
+        "date": bill.date,
+        "time": bill.time,
+        "breakfast": bill.breakfast_qty,
+        "lunch": bill.lunch_qty,
+        "breakfastExceptions": bill.breakfast_exception_qty,
+        "lunchExceptions": bill.lunch_exception_qty,
+        "totalItems": bill.total_items,
+        "amount": bill.total_amount,
+        "isGuest": bill.is_guest,
+        "hasExceptions": bill.breakfast_exception_qty > 0 or bill.lunch_exception_qty > 0
+    }
+
+@router.get("/api/reports/employee")
+async def get_employee_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    staff_id: Optional[str] = None,
+    employee_id: Optional[str] = None,
     company: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    format: str = Query("json", pattern=REPORT_FORMAT_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
-    query = db.query(BillingRecord).filter(BillingRecord.is_support_staff == True)
+    query = employee_report_query(current_user.username, start_date, end_date, employee_id, company)
+    
+    if format != "json":
+        # The body streams on its own session; don't hold this request's connection meanwhile
+        await db.close()
+        return stream_report(query, employee_report_row, EMPLOYEE_REPORT_COLUMNS, format, "employee-report")
+    return FastJSONResponse([employee_report_row(bill) for bill in await db.execute(query)])
+
+def support_staff_report_query(username: str, start_date, end_date, staff_id, company):
+    query = select(
+        BillingRecord.id,
+        BillingRecord.date,
+        BillingRecord.time,
+        BillingRecord.customer,
+        BillingRecord.customer_id,
+        BillingRecord.customer_name,
+        BillingRecord.company_name,
+        BillingRecord.breakfast_qty,
+        BillingRecord.lunch_qty,
+        BillingRecord.breakfast_exception_qty,
+        BillingRecord.lunch_exception_qty,
+        BillingRecord.total_items,
+        BillingRecord.total_amount
+    ).where(BillingRecord.is_support_staff == True)
     
     # Role-based filtering: admin sees all, others see only their own records
-    if current_user.username != "admin":
-        query = query.filter(BillingRecord.created_by == current_user.username)
+    if username != "admin":
+        query = query.where(BillingRecord.created_by == username)
     
     if start_date:
-        query = query.filter(BillingRecord.date >= start_date)
+        query = query.where(BillingRecord.date >= start_date)
     if end_date:
-        query = query.filter(BillingRecord.date <= end_date)
+        query = query.where(BillingRecord.date <= end_date)
     
-    bills = query.all()
-    
-    report_data = []
-    for bill in bills:
-        customer = bill.customer if isinstance(bill.customer, dict) else {}
-        items = bill.items if isinstance(bill.items, list) else []
-        
-        breakfast = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Breakfast')
-        lunch = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Lunch')
-        breakfast_exceptions = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Breakfast' and item.get('isException'))
-        lunch_exceptions = sum(item.get('quantity', 0) for item in items if item.get('name') == 'Lunch' and item.get('isException'))
-        
-        record = {
-            "id": bill.id,
-            "staffId": customer.get('staffId', 'N/A'),
-            "staffName": customer.get('name', 'Unknown'),
-            "designation": customer.get('designation', 'N/A'),
-            "company": customer.get('companyName', 'N/A'),
-            "date": bill.date,
-            "time": bill.time,
-            "breakfast": breakfast,
-            "lunch": lunch,
-            "breakfastExceptions": breakfast_exceptions,
-            "lunchExceptions": lunch_exceptions,
-            "totalItems": bill.total_items,
-            "amount": bill.total_amount,
-            "hasExceptions": breakfast_exceptions > 0 or lunch_exceptions > 0
-        }
-        
-        # Apply filters
-        if staff_id and record['staffId'] != staff_id:
-            continue
-        if company and record['company'] != company:
-            continue
-        
-        report_data.append(record)
+    if staff_id:
+        query = query.where(BillingRecord.customer_id == staff_id)
+    if company:
+        query = query.where(BillingRecord.company_name == company)
     
-    return report_data
+    return query.order_by(BillingRecord.id)
 
-@app.get("/api/reports/company")
-async def get_company_report(
+# Export columns, in the order the row function builds them
+SUPPORT_STAFF_REPORT_COLUMNS = [
+    "id",
+    "staffId",
+    "staffName",
+    "designation",
+    "company",
+    "date",
+    "time",
+    "breakfast",
+    "lunch",
+    "breakfastExceptions",
+    "lunchExceptions",
+    "totalItems",
+    "amount",
+    "hasExceptions"
+]
+
+def support_staff_report_row(bill) -> dict:
+    customer = bill.customer if isinstance(bill.customer, dict) else {}
+    return {
+        "id": bill.id,
+        "staffId": bill.customer_id or 'N/A',
+        "staffName": bill.customer_name or 'Unknown',
+        "designation": customer.get('designation', 'N/A'),
+        "company": bill.company_name or 'N/A',
+        "date": bill.date,
+        "time": bill.time,
+        "breakfast": bill.breakfast_qty,
+        "lunch": bill.lunch_qty,
+        "breakfastExceptions": bill.breakfast_exception_qty,
+        "lunchExceptions": bill.lunch_exception_qty,
+        "totalItems": bill.total_items,
+        "amount": bill.total_amount,
+        "hasExceptions": bill.breakfast_exception_qty > 0 or bill.lunch_exception_qty > 0
+    }
+
+@router.get("/api/reports/support-staff")
+async def get_support_staff_report(
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    staff_id: Optional[str] = None,
     company: Optional[str] = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    format: str = Query("json", pattern=REPORT_FORMAT_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
-    query = db.query(BillingRecord)
+    query = support_staff_report_query(current_user.username, start_date, end_date, staff_id, company)
+    
+    if format != "json":
+        # The body streams on its own session; don't hold this request's connection meanwhile
+        await db.close()
+        return stream_report(query, support_staff_report_row, SUPPORT_STAFF_REPORT_COLUMNS, format, "support-staff-report")
+    return FastJSONResponse([support_staff_report_row(bill) for bill in await db.execute(query)])
+
+def company_report_query(username: str, start_date, end_date, company, prices: PriceTable):
+    company_name = func.coalesce(BillingRecord.company_name, 'Unknown Company')
+    # Each bill is valued at the company prices of the version it was billed under
+    amount = func.sum(
+        BillingRecord.breakfast_qty * prices.company_price(BillingRecord.price_version, "breakfast")
+        + BillingRecord.lunch_qty * prices.company_price(BillingRecord.price_version, "lunch")
+    )
+    query = select(
+        company_name.label("company_name"),
+        func.count(BillingRecord.id).label("transactions"),
+        func.count(func.distinct(BillingRecord.customer_name)).label("employees"),
+        func.sum(BillingRecord.breakfast_qty).label("breakfast"),
+        func.sum(BillingRecord.lunch_qty).label("lunch"),
+        amount.label("amount")
+    )
     
     # Role-based filtering: admin sees all, others see only their own records
-    if current_user.username != "admin":
-        query = query.filter(BillingRecord.created_by == current_user.username)
+    if username != "admin":
+        query = query.where(BillingRecord.created_by == username)
     
     if start_date:
-        query = query.filter(BillingRecord.date >= start_date)
+        query = query.where(BillingRecord.date >= start_date)
     if end_date:
-        query = query.filter(BillingRecord.date <= end_date)
-    
-    bills = query.all()
-    
-    # Get price master for calculations
-    price_master = db.query(PriceMaster).first()
-    company_breakfast = price_master.company_breakfast if price_master else 135
-    company_lunch = price_master.company_lunch if price_master else 165
-    
-    company_stats = {}
-    
-    for bill in bills:
-        customer = bill.customer if isinstance(bill.customer, dict) else {}
-        company_name = customer.get('companyName', 'Unknown Company')
-        items = bill.items if isinstance(bill.items, list) else []
-        
-        if company and company_name != company:
-            continue
-        
-        if company_name not in company_stats:
-            company_stats[company_name] = {
-                "companyName": company_name,
-                "totalEmployees": 0,
-                "totalTransactions": 0,
-                "breakfast": 0,
-                "lunch": 0,
-                "totalItems": 0,
-                "totalAmount": 0,
-                "employees": set()
-            }
-        
-        company_stats[company_name]['totalTransactions'] += 1
-        
-        for item in items:
-            if item.get('name') == 'Breakfast':
-                qty = item.get('quantity', 0)
-                company_stats[company_name]['breakfast'] += qty
-                company_stats[company_name]['totalAmount'] += qty * company_breakfast
-            elif item.get('name') == 'Lunch':
-                qty = item.get('quantity', 0)
-                company_stats[company_name]['lunch'] += qty
-                company_stats[company_name]['totalAmount'] += qty * company_lunch
-        
-        company_stats[company_name]['totalItems'] = company_stats[company_name]['breakfast'] + company_stats[company_name]['lunch']
-        
-        # Track unique employees
-        employee_name = customer.get('name', '') if bill.is_guest else customer.get('employeeName', customer.get('name', 'Unknown'))
-        company_stats[company_name]['employees'].add(employee_name)
-    
-    # Convert set to count
-    report_data = []
-    for company_name, data in company_stats.items():
-        data['totalEmployees'] = len(data['employees'])
-        del data['employees']  # Remove set as it's not JSON serializable
-        report_data.append(data)
+        query = query.where(BillingRecord.date <= end_date)
+    if company:
+        query = query.where(company_name == company)
     
     # Sort by total amount
-    report_data.sort(key=lambda x: x['totalAmount'], reverse=True)
+    return query.group_by(company_name).order_by(amount.desc())
+
+# Export columns, in the order the row function builds them
+COMPANY_REPORT_COLUMNS = [
+    "companyName",
+    "totalEmployees",
+    "totalTransactions",
+    "breakfast",
+    "lunch",
+    "totalItems",
+    "totalAmount"
+]
+
+def company_report_row(row) -> dict:
+    breakfast = int(row.breakfast or 0)
+    lunch = int(row.lunch or 0)
+    return {
+        "companyName": row.company_name,
+        "totalEmployees": row.employees,
+        "totalTransactions": row.transactions,
+        "breakfast": breakfast,
+        "lunch": lunch,
+        "totalItems": breakfast + lunch,
+        "totalAmount": float(row.amount or 0)
+    }
+
+@router.get("/api/reports/company")
+async def get_company_report(
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    company: Optional[str] = None,
+    format: str = Query("json", pattern=REPORT_FORMAT_PATTERN),
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    prices = await price_cache.get(db)
+    query = company_report_query(current_user.username, start_date, end_date, company, prices)
     
-    return report_data
+    if format != "json":
+        # The body streams on its own session; don't hold this request's connection meanwhile
+        await db.close()
+        return stream_report(query, company_report_row, COMPANY_REPORT_COLUMNS, format, "company-report")
+    return FastJSONResponse([company_report_row(row) for row in await db.execute(query)])
+
+# ==================== JOB ENDPOINTS ====================
+
+@router.get("/api/jobs/{job_id}")
+async def get_job(job_id: str, current_user: AuthenticatedUser = Depends(get_current_user)):
+    # Any worker can answer: job state is stored in the database
+    job = await job_queue.load(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
 # Health check endpoint
-@app.get("/api/health")
+@router.get("/api/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+# Prometheus scrape target (this worker's counters only)
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return metrics_response()
+
+def create_app() -> FastAPI:
+    application = FastAPI(title="POS System API")
+    
+    # CORS Configuration
+    application.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify exact origins
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    application.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_SIZE)
+    # Outermost, so latency includes compression and CORS
+    application.add_middleware(MetricsMiddleware, track_db=True)
+    
+    application.include_router(router)
+    application.add_event_handler("startup", startup_event)
+    application.add_event_handler("shutdown", password_workers.shutdown)
+    application.add_event_handler("shutdown", job_queue.shutdown)
+    return application
+
+app = create_app()
+
 if __name__ == "__main__":
     import uvicorn
+    from bootstrap import bootstrap
+    
+    # Local runs set up their own database; deployments run bootstrap.py once
+    bootstrap()
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
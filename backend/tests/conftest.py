@@ -0,0 +1,21 @@
+"""
+Test setup: a throwaway SQLite database and dummy settings, configured before
+any backend module reads them.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TEST_DB = os.path.join(tempfile.mkdtemp(prefix="pos-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("HRMS_API_URL", "http://127.0.0.1:9/api/employees/")
+os.environ.setdefault("HRMS_API_TOKEN", "test-token")
+
+from bootstrap import bootstrap  # noqa: E402
+
+bootstrap()
@@ -0,0 +1,202 @@
+"""
+HRMS sync jobs driven through JobQueue against a local stub HRMS server.
+"""
+import asyncio
+import json
+import threading
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from config import settings
+from database import SessionLocal
+from jobs import JobQueue, JobStore
+from models import BackgroundJob, Employee
+import server
+
+PAGE_SIZE = 3
+
+def hrms_record(employee_id: str) -> dict:
+    return {
+        "employee_id": employee_id,
+        "employee_name": f"Employee {employee_id}",
+        "designation": "Engineer",
+        "company": {"company_name": "Acme"},
+        "branch": {"branch_name": "HQ"},
+        "mobile_number": "9000000000",
+        "qr_code_image": ""
+    }
+
+class StubHrms:
+    """Serves the configured records as paginated results/next pages"""
+
+    def __init__(self):
+        self.records = []
+        self.status = 200
+        self.requests = 0
+        # Set to hold each response until the test releases it
+        self.gate = threading.Event()
+        self.gate.set()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests += 1
+                stub.gate.wait(10)
+                if stub.status != 200:
+                    self.send_response(stub.status)
+                    self.end_headers()
+                    return
+                page = int(self.path.split("page=")[1]) if "page=" in self.path else 1
+                start = (page - 1) * PAGE_SIZE
+                more = start + PAGE_SIZE < len(stub.records)
+                body = json.dumps({
+                    "results": stub.records[start:start + PAGE_SIZE],
+                    "next": f"/api/employees/?page={page + 1}" if more else None
+                }).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/api/employees/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.gate.set()
+        self.server.shutdown()
+        self.server.server_close()
+
+@pytest.fixture
+def hrms(monkeypatch):
+    stub = StubHrms()
+    monkeypatch.setattr(settings, "HRMS_API_URL", stub.url)
+    with SessionLocal() as db:
+        db.query(Employee).delete()
+        db.query(BackgroundJob).delete()
+        db.commit()
+    yield stub
+    stub.close()
+
+def active_employee_ids() -> set:
+    with SessionLocal() as db:
+        return {row.employee_id for row in db.query(Employee.employee_id).filter(Employee.is_active == True)}
+
+async def run_sync(queue: JobQueue):
+    job, created = await queue.submit("hrms_sync", server.hrms_sync_job)
+    assert created
+    await queue._queue.join()
+    await queue.shutdown()
+    return job
+
+def test_sync_job_completes_across_pages(hrms):
+    hrms.records = [hrms_record(f"E{i}") for i in range(8)]
+
+    job = asyncio.run(run_sync(JobQueue()))
+
+    assert job.status == "completed", job.error
+    assert job.result["inserted"] == 8
+    assert job.progress["fetched"] == 8
+    assert hrms.requests == 3
+    assert active_employee_ids() == {f"E{i}" for i in range(8)}
+
+def test_job_state_is_visible_to_other_workers(hrms):
+    hrms.records = [hrms_record("E1")]
+
+    job = asyncio.run(run_sync(JobQueue()))
+    # A second queue stands in for another API worker process
+    loaded = asyncio.run(JobQueue().load(job.id))
+
+    assert loaded is not None
+    assert loaded.to_dict() == job.to_dict()
+
+def test_active_job_is_deduplicated(hrms):
+    hrms.records = [hrms_record("E1")]
+    hrms.gate.clear()
+
+    async def scenario():
+        queue = JobQueue()
+        other_worker = JobQueue()
+        first, created = await queue.submit("hrms_sync", server.hrms_sync_job)
+        again, created_again = await queue.submit("hrms_sync", server.hrms_sync_job)
+        elsewhere, created_elsewhere = await other_worker.submit("hrms_sync", server.hrms_sync_job)
+        hrms.gate.set()
+        await queue._queue.join()
+        await queue.shutdown()
+        return first, created, (again, created_again), (elsewhere, created_elsewhere)
+
+    first, created, again, elsewhere = asyncio.run(scenario())
+
+    assert created
+    assert again == (first, False)
+    assert elsewhere[0].id == first.id and not elsewhere[1]
+    assert first.status == "completed"
+    assert hrms.requests == 1
+
+def test_stale_job_does_not_block_a_new_one(hrms):
+    hrms.records = [hrms_record("E1")]
+    with SessionLocal() as db:
+        long_ago = datetime.utcnow() - timedelta(hours=1)
+        db.add(BackgroundJob(id="dead", kind="hrms_sync", status="running", progress={},
+                             created_at=long_ago, heartbeat_at=long_ago))
+        db.commit()
+
+    job = asyncio.run(run_sync(JobQueue()))
+
+    assert job.id != "dead"
+    assert job.status == "completed"
+
+def test_failed_fetch_fails_the_job_and_keeps_data(hrms):
+    hrms.records = [hrms_record(f"E{i}") for i in range(4)]
+    asyncio.run(run_sync(JobQueue()))
+    hrms.status = 500
+
+    job = asyncio.run(run_sync(JobQueue()))
+    stored = JobStore().load(job.id)
+
+    assert job.status == "failed"
+    assert "500" in job.error
+    assert stored.status == "failed" and stored.error == job.error
+    assert active_employee_ids() == {f"E{i}" for i in range(4)}
+
+def test_retire_guard_keeps_rows_on_a_large_drop(hrms):
+    hrms.records = [hrms_record(f"E{i}") for i in range(10)]
+    asyncio.run(run_sync(JobQueue()))
+    hrms.records = hrms.records[:5]
+
+    job = asyncio.run(run_sync(JobQueue()))
+
+    assert job.status == "completed", job.error
+    assert job.result["removed"] == 0
+    assert job.result["retirements_skipped"] == 5
+    assert job.result["warnings"]
+    assert len(active_employee_ids()) == 10
+
+def test_retire_guard_keeps_rows_on_an_empty_payload(hrms):
+    hrms.records = [hrms_record(f"E{i}") for i in range(3)]
+    asyncio.run(run_sync(JobQueue()))
+    hrms.records = []
+
+    job = asyncio.run(run_sync(JobQueue()))
+
+    assert job.status == "completed", job.error
+    assert job.result["retirements_skipped"] == 3
+    assert "no records" in job.result["warnings"][0]
+    assert len(active_employee_ids()) == 3
+
+def test_retire_guard_allows_a_small_drop(hrms):
+    hrms.records = [hrms_record(f"E{i}") for i in range(10)]
+    asyncio.run(run_sync(JobQueue()))
+    hrms.records = hrms.records[:9]
+
+    job = asyncio.run(run_sync(JobQueue()))
+
+    assert job.result["removed"] == 1
+    assert not job.result["warnings"]
+    assert active_employee_ids() == {f"E{i}" for i in range(9)}
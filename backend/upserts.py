@@ -0,0 +1,41 @@
+"""
+Atomic insert-or-increment for the counter tables (daily consumption, meal rollups).
+Uses the dialect's native upsert, so a counter's first row for a key is created
+without a locking read of the missing row (which takes a gap lock on InnoDB and
+deadlocks two counters billing at the same time).
+"""
+from typing import Dict, List, Sequence
+
+from sqlalchemy import Table
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+def increment_statement(dialect_name: str, table: Table, key_columns: Sequence[str], counters: Sequence[str], extra_updates: Dict = None):
+    """INSERT ... that adds the inserted counters to an existing row with the same key"""
+    extra_updates = extra_updates or {}
+    if dialect_name == "mysql":
+        statement = mysql.insert(table)
+        return statement.on_duplicate_key_update({
+            **{name: table.c[name] + statement.inserted[name] for name in counters},
+            **extra_updates
+        })
+    if dialect_name == "sqlite":
+        statement = sqlite.insert(table)
+        return statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={
+                **{name: table.c[name] + statement.excluded[name] for name in counters},
+                **extra_updates
+            }
+        )
+    raise NotImplementedError(f"No counter upsert for the {dialect_name} dialect")
+
+async def increment_counters(db: AsyncSession, table: Table, key_columns: Sequence[str], counters: Sequence[str],
+                             rows: List[dict], extra_updates: Dict = None):
+    """Upsert rows, adding their counters to existing ones (caller commits)"""
+    if not rows:
+        return
+    # Same key order in every transaction, so multi-row upserts can't deadlock each other
+    rows = sorted(rows, key=lambda row: tuple(row[name] for name in key_columns))
+    statement = increment_statement(db.get_bind().dialect.name, table, key_columns, counters, extra_updates)
+    await db.execute(statement, rows)
@@ -0,0 +1,54 @@
+import React, { useEffect, useState } from 'react';
+import { employeeAPI } from '../services/api';
+
+// Object URLs of QR images already fetched (null when the employee has none),
+// so a search that lists the same people again doesn't download them again
+const qrUrls = new Map<string, string | null>();
+
+interface QrThumbnailProps {
+  employeeId: string;
+}
+
+export const QrThumbnail: React.FC<QrThumbnailProps> = ({ employeeId }) => {
+  const [url, setUrl] = useState<string | null | undefined>(() => qrUrls.get(employeeId));
+
+  useEffect(() => {
+    if (qrUrls.has(employeeId)) {
+      setUrl(qrUrls.get(employeeId));
+      return;
+    }
+
+    let cancelled = false;
+    employeeAPI.getQrCode(Number(employeeId))
+      .then((blob) => URL.createObjectURL(blob))
+      .catch(() => null)
+      .then((objectUrl) => {
+        qrUrls.set(employeeId, objectUrl);
+        if (!cancelled) setUrl(objectUrl);
+      });
+
+    return () => {
+      cancelled = true;
+    };
+  }, [employeeId]);
+
+  if (!url) {
+    return (
+      <div className="w-6 h-6 bg-gray-100 rounded-lg flex items-center justify-center">
+        <i className="ri-user-line text-gray-500 text-xs"></i>
+      </div>
+    );
+  }
+
+  return (
+    <div className="w-6 h-6 border border-gray-300 rounded-lg overflow-hidden">
+      <img
+        src={url}
+        alt="QR"
+        className="w-full h-full object-cover"
+      />
+    </div>
+  );
+};
+
+export default QrThumbnail;
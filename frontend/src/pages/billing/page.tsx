@@ -3,7 +3,9 @@ import { useState, useEffect } from 'react';
 import Layout from '../../components/feature/Layout';
 import { employeeAPI, supportStaffAPI, guestAPI, billingAPI, priceMasterAPI } from '../../services/api';
 import Receipt from '../../components/Receipt';
+import QrThumbnail from '../../components/QrThumbnail';
 import { generateReceiptData, autoPrintReceipt } from '../../utils/printReceipt';
+import { businessDate } from '../../utils/businessDate';
 
 export default function Billing() {
   const [cart, setCart] = useState<CartItem[]>([]);
@@ -17,6 +19,7 @@ export default function Billing() {
   const [isSupportStaff, setIsSupportStaff] = useState(false);
   const [showAddGuest, setShowAddGuest] = useState(false);
   const [employees, setEmployees] = useState<Employee[]>([]);
+  const [filteredEmployees, setFilteredEmployees] = useState<Employee[]>([]);
   const [supportStaff, setSupportStaff] = useState<SupportStaff[]>([]);
   const [selectedSupportStaff, setSelectedSupportStaff] = useState('');
   const [supportStaffSearch, setSupportStaffSearch] = useState('');
@@ -39,6 +42,8 @@ export default function Billing() {
     employee: { breakfast: 20, lunch: 48 },
     company: { breakfast: 135, lunch: 165 }
   });
+  // One key per cart, so a double-tapped or retried checkout creates a single bill
+  const [checkoutKey, setCheckoutKey] = useState(() => crypto.randomUUID());
   const [todaysConsumption, setTodaysConsumption] = useState<{ breakfast: number; lunch: number }>({ breakfast: 0, lunch: 0 });
 
   // Load data from backend on component mount
@@ -46,10 +51,15 @@ export default function Billing() {
     loadAllData();
   }, []);
 
+  // A changed cart or customer is a different bill, so it must not reuse the key of a failed checkout
+  useEffect(() => {
+    setCheckoutKey(crypto.randomUUID());
+  }, [cart, isGuest, isSupportStaff, selectedEmployee, selectedSupportStaff, selectedGuest]);
+
   const loadAllData = async () => {
     try {
       // Load employees
-      const employeeData = await employeeAPI.getAll();
+      const employeeData = await employeeAPI.getDirectory();
       setEmployees(employeeData);
       
       // Extract unique company names from employees
@@ -65,7 +75,7 @@ export default function Billing() {
       setGuests(guestData);
 
       // Load support staff
-      const staffData = await supportStaffAPI.getAll();
+      const staffData = await supportStaffAPI.getDirectory();
       setSupportStaff(staffData);
 
       // Load price master
@@ -91,10 +101,36 @@ export default function Billing() {
     { id: '2', name: 'Lunch', price: 0, category: 'Lunch' }
   ];
 
-  const filteredEmployees = employees.filter(emp => 
-    emp.employeeName.toLowerCase().includes(employeeSearch.toLowerCase()) ||
-    emp.employeeId.toLowerCase().includes(employeeSearch.toLowerCase())
-  );
+  // Employee autocomplete is served by the backend search index
+  useEffect(() => {
+    const query = employeeSearch.trim();
+    if (!query || selectedEmployee) {
+      setFilteredEmployees([]);
+      return;
+    }
+    
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await employeeAPI.search(query, ['employee']);
+        if (!cancelled) {
+          setFilteredEmployees(results.map((entry: any) => ({
+            id: entry.id.toString(),
+            employeeId: entry.code,
+            employeeName: entry.name,
+            companyName: entry.companyName
+          })));
+        }
+      } catch (error) {
+        console.error('Error searching employees:', error);
+      }
+    }, 150);
+    
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [employeeSearch, selectedEmployee]);
 
   const filteredSupportStaff = supportStaff.filter(staff => 
     staff.name.toLowerCase().includes(supportStaffSearch.toLowerCase()) ||
@@ -103,42 +139,15 @@ export default function Billing() {
 
   // Check if employee/support staff has already consumed meals today
   const checkConsumption = async (personId: string, isEmployee: boolean = true) => {
-    const today = new Date().toISOString().split('T')[0];
-    let billingHistory: any[] = [];
+    const today = businessDate();
     
     try {
-      billingHistory = await billingAPI.getHistory(today, today);
+      const eligibility = await billingAPI.checkEligibility(personId, isEmployee ? 'employee' : 'support_staff', today);
+      return eligibility.consumedToday as { breakfast: number; lunch: number };
     } catch (error) {
-      console.error('Error fetching billing history:', error);
+      console.error('Error checking meal eligibility:', error);
       return { breakfast: 0, lunch: 0 };
     }
-    
-    const todaysBills = billingHistory.filter((bill: any) => 
-      bill.date === today && 
-      !bill.isGuest && 
-      (isEmployee ? 
-        (!bill.isSupportStaff && bill.customer?.employeeId === personId) :
-        (bill.isSupportStaff && bill.customer?.staffId === personId)
-      )
-    );
-
-    let breakfastCount = 0;
-    let lunchCount = 0;
-
-    todaysBills.forEach((bill: any) => {
-      bill.items.forEach((item: any) => {
-        // Only count non-exception items for validation
-        if (!item.isException) {
-          if (item.name === 'Breakfast') {
-            breakfastCount += item.quantity;
-          } else if (item.name === 'Lunch') {
-            lunchCount += item.quantity;
-          }
-        }
-      });
-    });
-
-    return { breakfast: breakfastCount, lunch: lunchCount };
   };
 
   const handleSupportStaffSelect = async (staffId: string, staffName?: string, staffIdText?: string) => {
@@ -342,7 +351,7 @@ export default function Billing() {
         designation: newSupportStaffDesignation,
         companyName: newSupportStaffCompany,
         createdBy: 'Billing',
-        createdDate: new Date().toISOString().split('T')[0]
+        createdDate: businessDate()
       };
       setSupportStaff([...supportStaff, newStaff]);
       setSelectedSupportStaff(newStaff.id);
@@ -408,7 +417,7 @@ export default function Billing() {
     // Save billing data to localStorage for reports
     const billingData = {
       id: Date.now().toString(),
-      date: new Date().toISOString().split('T')[0],
+      date: businessDate(),
       time: new Date().toLocaleTimeString(),
       isGuest,
       isSupportStaff,
@@ -464,7 +473,7 @@ export default function Billing() {
         }
 
         const bill = {
-          date: new Date().toISOString().split('T')[0],
+          date: businessDate(),
           time: new Date().toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
           is_guest: true,
           is_support_staff: false,
@@ -494,7 +503,7 @@ export default function Billing() {
           pricing_type: 'company'
         };
 
-        const createdBill = await billingAPI.create(bill);
+        const createdBill = await billingAPI.create(bill, checkoutKey);
         
         // Generate receipt data
         const currentUser = localStorage.getItem('currentUser') || 'Admin';
@@ -531,7 +540,7 @@ export default function Billing() {
         }
 
         const bill = {
-          date: new Date().toISOString().split('T')[0],
+          date: businessDate(),
           time: new Date().toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
           is_guest: false,
           is_support_staff: false,
@@ -562,7 +571,7 @@ export default function Billing() {
           pricing_type: 'employee'
         };
 
-        const createdBill = await billingAPI.create(bill);
+        const createdBill = await billingAPI.create(bill, checkoutKey);
         
         // Generate receipt data
         const currentUser = localStorage.getItem('currentUser') || 'Admin';
@@ -595,7 +604,7 @@ export default function Billing() {
         }
 
         const bill = {
-          date: new Date().toISOString().split('T')[0],
+          date: businessDate(),
           time: new Date().toLocaleTimeString('en-US', { hour: '2-digit', minute: '2-digit' }),
           is_guest: false,
           is_support_staff: true,
@@ -627,7 +636,7 @@ export default function Billing() {
           pricing_type: 'employee'
         };
 
-        const createdBill = await billingAPI.create(bill);
+        const createdBill = await billingAPI.create(bill, checkoutKey);
         
         // Generate receipt data
         const currentUser = localStorage.getItem('currentUser') || 'Admin';
@@ -940,19 +949,8 @@ export default function Billing() {
                           className="w-full px-2 py-2 text-left hover:bg-gray-50 cursor-pointer border-b border-gray-100 last:border-b-0 transition-colors"
                         >
                           <div className="flex items-center space-x-2">
-                            {emp.qrCode ? (
-                              <div className="w-6 h-6 border border-gray-300 rounded-lg overflow-hidden">
-                                <img
-                                  src={emp.qrCode}
-                                  alt="QR"
-                                  className="w-full h-full object-cover"
-                                />
-                              </div>
-                            ) : (
-                              <div className="w-6 h-6 bg-gray-100 rounded-lg flex items-center justify-center">
-                                <i className="ri-user-line text-gray-500 text-xs"></i>
-                              </div>
-                            )}
+                            {/* Search results are slim; the QR image is fetched on demand */}
+                            <QrThumbnail employeeId={emp.id} />
                             <div className="flex-1 min-w-0">
                               <div className="font-medium text-gray-900 truncate text-xs">{emp.employeeName}</div>
                               <div className="text-xs text-gray-500 truncate">
@@ -1407,7 +1405,6 @@ interface Employee {
   employeeName: string;
   employeeId: string;
   companyName: string;
-  qrCode?: string;
 }
 
 interface Guest {
@@ -39,16 +39,53 @@ export default function Dashboard() {
     }
   });
   const [companyWiseData, setCompanyWiseData] = useState<any[]>([]);
+  // Date range the live stream is currently showing
+  const [range, setRange] = useState({ startDate: '', endDate: '' });
 
-  // Load dashboard data on component mount
+  // Live dashboard: a snapshot from the server, then deltas as bills are created
   useEffect(() => {
-    loadDashboardData();
-  }, []);
+    setLoading(true);
+    return dashboardAPI.stream(range.startDate, range.endDate, {
+      onSnapshot: (response) => {
+        setStats(response.stats);
+        setCompanyWiseData(response.companyWiseData);
+        setLoading(false);
+      },
+      onDelta: applyChanges,
+      onError: (error) => {
+        // Show current figures while the stream reconnects
+        console.error('Dashboard stream interrupted, reconnecting:', error);
+        loadDashboardData();
+      },
+    });
+  }, [range]);
+
+  const applyChanges = (changes: any[]) => {
+    setStats((prev) => {
+      const next = { breakfast: { ...prev.breakfast }, lunch: { ...prev.lunch } };
+      changes.forEach((change) => {
+        const meal = next[change.meal as 'breakfast' | 'lunch'];
+        meal[change.category as 'employee' | 'supportStaff' | 'guest'] += change.quantity;
+        meal.total += change.quantity;
+      });
+      return next;
+    });
+    setCompanyWiseData((prev) => {
+      const companies = new Map(prev.map((company) => [company.name, { ...company }]));
+      changes.forEach((change) => {
+        const company = companies.get(change.companyName) || { name: change.companyName, breakfast: 0, lunch: 0, total: 0 };
+        company[change.meal] += change.quantity;
+        company.total += change.quantity;
+        companies.set(change.companyName, company);
+      });
+      return Array.from(companies.values()).sort((a, b) => b.total - a.total);
+    });
+  };
 
   const loadDashboardData = async () => {
     try {
       setLoading(true);
-      const response = await dashboardAPI.getStats(startDate, endDate);
+      const response = await dashboardAPI.getStats(range.startDate, range.endDate);
       setStats(response.stats);
       setCompanyWiseData(response.companyWiseData);
     } catch (error) {
@@ -135,15 +172,13 @@ export default function Dashboard() {
   };
 
   const handleDateFilter = () => {
-    loadDashboardData();
+    setRange({ startDate, endDate });
   };
 
   const resetFilters = () => {
     setStartDate('');
     setEndDate('');
-    setTimeout(() => {
-      loadDashboardData();
-    }, 100);
+    setRange({ startDate: '', endDate: '' });
   };
 
   // Clear all data function - Note: With backend, this would need an API endpoint
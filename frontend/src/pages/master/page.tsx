@@ -1,7 +1,8 @@
 
 import { useState, useEffect } from 'react';
 import Layout from '../../components/feature/Layout';
-import { employeeAPI, supportStaffAPI, priceMasterAPI } from '../../services/api';
+import { employeeAPI, supportStaffAPI, priceMasterAPI, jobsAPI } from '../../services/api';
+import { businessDate } from '../../utils/businessDate';
 
 interface Employee {
   id: string;
@@ -237,14 +238,20 @@ export default function Master() {
   const syncWithHRMS = async () => {
     setIsLoading(true);
     try {
-      const response = await employeeAPI.syncHRMS();
+      const { jobId } = await employeeAPI.syncHRMS();
+      const job = await jobsAPI.waitFor(jobId);
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'HRMS sync failed');
+      }
+      const response = job.result;
       alert(
-        `✅ HRMS sync completed.\nNew Employees: ${response.new_employees}\nNew Support Staff: ${response.new_support_staff}`
+        `✅ HRMS sync completed.\nNew Employees: ${response.new_employees}\nNew Support Staff: ${response.new_support_staff}\nUpdated: ${response.updated}\nUnchanged: ${response.unchanged}\nRemoved: ${response.removed}` +
+        (response.warnings?.length ? `\n\n⚠️ ${response.warnings.join('\n⚠️ ')}` : '')
       );
       await loadAllData(); // Reload data after sync
     } catch (error: any) {
       console.error('HRMS sync error:', error);
-      alert(error.response?.data?.detail || 'Failed to sync with HRMS. Please try again.');
+      alert(error.response?.data?.detail || error.message || 'Failed to sync with HRMS. Please try again.');
     } finally {
       setIsLoading(false);
     }
@@ -447,7 +454,7 @@ export default function Master() {
                 location: values[5] || '',
                 qrCode: values[6] || '',
                 createdBy: 'Import',
-                createdDate: new Date().toISOString().split('T')[0]
+                createdDate: businessDate()
               });
             }
           }
@@ -472,7 +479,7 @@ export default function Master() {
                 companyName: values[3] || '',
                 biometricData: values[4] || '',
                 createdBy: 'Import',
-                createdDate: new Date().toISOString().split('T')[0]
+                createdDate: businessDate()
               });
             }
           }
@@ -53,6 +53,23 @@ export const employeeAPI = {
     const response = await apiClient.get('/api/employees');
     return response.data;
   },
+  getDirectory: async () => {
+    const response = await apiClient.get('/api/employees/directory');
+    return response.data;
+  },
+  search: async (query: string, types?: string[], limit: number = 20) => {
+    const params = new URLSearchParams();
+    params.append('q', query);
+    if (types?.length) params.append('types', types.join(','));
+    params.append('limit', limit.toString());
+    
+    const response = await apiClient.get(`/api/employees/search?${params.toString()}`);
+    return response.data;
+  },
+  getQrCode: async (id: number) => {
+    const response = await apiClient.get(`/api/employees/${id}/qr`, { responseType: 'blob' });
+    return response.data as Blob;
+  },
   create: async (employee: any) => {
     const response = await apiClient.post('/api/employees', employee);
     return response.data;
@@ -76,6 +93,10 @@ export const supportStaffAPI = {
     const response = await apiClient.get('/api/support-staff');
     return response.data;
   },
+  getDirectory: async () => {
+    const response = await apiClient.get('/api/support-staff/directory');
+    return response.data;
+  },
   create: async (staff: any) => {
     const response = await apiClient.post('/api/support-staff', staff);
     return response.data;
@@ -102,18 +123,66 @@ export const guestAPI = {
 };
 
 export const billingAPI = {
-  getHistory: async (startDate?: string, endDate?: string) => {
+  getHistory: async (
+    startDate?: string,
+    endDate?: string,
+    page: { cursor?: string; limit?: number; fields?: string[] } = {}
+  ) => {
     const params = new URLSearchParams();
     if (startDate) params.append('start_date', startDate);
     if (endDate) params.append('end_date', endDate);
+    if (page.cursor) params.append('cursor', page.cursor);
+    if (page.limit) params.append('limit', page.limit.toString());
+    if (page.fields?.length) params.append('fields', page.fields.join(','));
     
     const response = await apiClient.get(`/api/billing/history?${params.toString()}`);
     return response.data;
   },
-  create: async (billing: any) => {
-    const response = await apiClient.post('/api/billing/create', billing);
+  // Reuse the same idempotency key when retrying a bill so it is only stored once
+  create: async (billing: any, idempotencyKey?: string) => {
+    const response = await apiClient.post('/api/billing/create', billing, {
+      headers: idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : undefined,
+    });
+    return response.data;
+  },
+  // Replay bills queued while offline; each needs a client_bill_id so retries are safe
+  createBulk: async (bills: any[]) => {
+    const response = await apiClient.post('/api/billing/bulk', { bills });
+    return response.data;
+  },
+  checkEligibility: async (customerId: string, customerType: 'employee' | 'support_staff', date?: string) => {
+    const params = new URLSearchParams();
+    params.append('customer_id', customerId);
+    params.append('customer_type', customerType);
+    if (date) params.append('date', date);
+    
+    const response = await apiClient.get(`/api/billing/eligibility?${params.toString()}`);
+    return response.data;
+  },
+};
+
+export const lookupAPI = {
+  byCode: async (code: string, date?: string) => {
+    const params = new URLSearchParams();
+    if (date) params.append('date', date);
+    
+    const response = await apiClient.get(`/api/lookup/${encodeURIComponent(code)}?${params.toString()}`);
+    return response.data;
+  },
+};
+
+export const jobsAPI = {
+  get: async (jobId: string) => {
+    const response = await apiClient.get(`/api/jobs/${jobId}`);
     return response.data;
   },
+  waitFor: async (jobId: string, intervalMs: number = 1000) => {
+    for (;;) {
+      const job = await jobsAPI.get(jobId);
+      if (job.status === 'completed' || job.status === 'failed') return job;
+      await new Promise((resolve) => setTimeout(resolve, intervalMs));
+    }
+  },
 };
 
 export const priceMasterAPI = {
@@ -127,6 +196,16 @@ export const priceMasterAPI = {
   },
 };
 
+// Reconnect backoff for the live dashboard stream
+const DASHBOARD_RETRY_MIN_MS = 1000;
+const DASHBOARD_RETRY_MAX_MS = 30000;
+
+class DashboardAuthError extends Error {
+  constructor() {
+    super('Dashboard stream unauthorized');
+  }
+}
+
 export const dashboardAPI = {
   getStats: async (startDate?: string, endDate?: string) => {
     const params = new URLSearchParams();
@@ -136,6 +215,79 @@ export const dashboardAPI = {
     const response = await apiClient.get(`/api/dashboard/stats?${params.toString()}`);
     return response.data;
   },
+  // Live stats over Server-Sent Events: a snapshot, then deltas as bills are created.
+  // Uses fetch so the bearer token can be sent; a dropped stream is reopened with
+  // exponential backoff (each reconnect starts with a fresh snapshot). Returns a
+  // function that closes the stream.
+  stream: (
+    startDate: string | undefined,
+    endDate: string | undefined,
+    handlers: { onSnapshot: (data: any) => void; onDelta: (changes: any[]) => void; onError?: (error: unknown) => void }
+  ) => {
+    const controller = new AbortController();
+    const params = new URLSearchParams();
+    if (startDate) params.append('start_date', startDate);
+    if (endDate) params.append('end_date', endDate);
+    let retryDelay = DASHBOARD_RETRY_MIN_MS;
+    
+    const read = async () => {
+      const token = localStorage.getItem('token');
+      const response = await fetch(`${API_BASE_URL}/api/dashboard/stream?${params.toString()}`, {
+        headers: token ? { Authorization: `Bearer ${token}` } : {},
+        signal: controller.signal,
+      });
+      if (response.status === 401) throw new DashboardAuthError();
+      if (!response.ok || !response.body) throw new Error(`Dashboard stream failed: ${response.status}`);
+      
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+      let buffer = '';
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) throw new Error('Dashboard stream closed');
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+          const message = buffer.slice(0, end);
+          buffer = buffer.slice(end + 2);
+          let event = 'message';
+          let data = '';
+          message.split('\n').forEach((line) => {
+            if (line.startsWith('event: ')) event = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+          });
+          if (!data) continue;
+          if (event === 'snapshot') {
+            // Connected and caught up: the next drop starts backing off from the minimum again
+            retryDelay = DASHBOARD_RETRY_MIN_MS;
+            handlers.onSnapshot(JSON.parse(data));
+          } else if (event === 'delta') handlers.onDelta(JSON.parse(data).changes);
+        }
+      }
+    };
+    
+    (async () => {
+      while (!controller.signal.aborted) {
+        try {
+          await read();
+        } catch (error) {
+          if (controller.signal.aborted) return;
+          handlers.onError?.(error);
+          // A rejected token won't get better by retrying
+          if (error instanceof DashboardAuthError) return;
+        }
+        await new Promise<void>((resolve) => {
+          const timer = setTimeout(resolve, retryDelay);
+          controller.signal.addEventListener('abort', () => {
+            clearTimeout(timer);
+            resolve();
+          }, { once: true });
+        });
+        retryDelay = Math.min(retryDelay * 2, DASHBOARD_RETRY_MAX_MS);
+      }
+    })();
+    
+    return () => controller.abort();
+  },
 };
 
 export const reportsAPI = {
@@ -168,6 +320,16 @@ export const reportsAPI = {
     const response = await apiClient.get(`/api/reports/company?${params.toString()}`);
     return response.data;
   },
+  download: async (report: 'employee' | 'support-staff' | 'company', filters: any = {}, format: 'csv' | 'ndjson' = 'csv') => {
+    const params = new URLSearchParams();
+    Object.entries(filters).forEach(([key, value]) => {
+      if (value) params.append(key, String(value));
+    });
+    params.append('format', format);
+    
+    const response = await apiClient.get(`/api/reports/${report}?${params.toString()}`, { responseType: 'blob' });
+    return response.data as Blob;
+  },
 };
 
 export default apiClient;
\ No newline at end of file
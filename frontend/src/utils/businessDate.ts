@@ -0,0 +1,13 @@
+// Bills, meal limits and eligibility all count by the canteen's calendar day,
+// not the UTC day; keep in sync with BUSINESS_TIMEZONE on the backend
+export const BUSINESS_TIMEZONE = import.meta.env.VITE_BUSINESS_TIMEZONE || 'Asia/Kolkata';
+
+const dateFormat = new Intl.DateTimeFormat('en-CA', {
+  timeZone: BUSINESS_TIMEZONE,
+  year: 'numeric',
+  month: '2-digit',
+  day: '2-digit',
+});
+
+// YYYY-MM-DD in the business timezone
+export const businessDate = (at: Date = new Date()) => dateFormat.format(at);
@@ -18,7 +18,7 @@ export const printReceiptSilent = async (receiptData: any) => {
     }
     
     const result = await response.json();
-    console.log('Print successful:', result);
+    console.log('Print queued:', result);
     return true;
   } catch (error: any) {
     console.error('Silent print failed:', error);